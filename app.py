@@ -1,17 +1,23 @@
+# Heavy page-specific libraries (plotly, requests, google.generativeai, and
+# the model with xgboost and scikit-learn) are loaded inside the pages that
+# use them, so a cold start only pays for the page being shown; see
+# importtime.py
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle
-import requests
-import matplotlib.pyplot as plt
-import plotly.express as px
-import openai
-import google.generativeai as genai
+from model_store import get_model_holder
+from neighbors import get_field_index
+from market import CHANNEL_PRICE_FACTORS, PROCESSING_OPTIONS, RISK_STREAM, SPOT_STREAM, STORAGE_OPTIONS, crop_rng, price_matrix, profit_summary
+from forecasting import fitted_model, forecast_months, history_months
+from strategy import optimize
+from risk import monthly_volatility, simulate_profit, yield_range
+from instrumentation import start_rerun
+from prices import get_price_cache
+from recommend import RECOMMENDATION_CACHE, SOIL_TYPES, build_input, feature_defaults, recommend_one
 
 
-# Load the trained model
-with open("crop_prediction_model.pkl", "rb") as file:
-    model, le, scaler = pickle.load(file)
+# Timings of this script run (see instrumentation.py)
+rerun = start_rerun()
 
 
 # Crop information dictionary
@@ -28,6 +34,10 @@ def local_css(file_name):
     with open(file_name) as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+def number_format(frame, fmt):
+    # Column formats for st.dataframe; DataFrame.style would import matplotlib
+    return {name: st.column_config.NumberColumn(format=fmt) for name in frame.select_dtypes("number").columns}
+
 # Streamlit UI Setup
 st.set_page_config(page_title="next-gen Farming system", layout="wide")
 
@@ -50,6 +60,7 @@ with st.sidebar:
 
     selection = st.radio("Go to", ["Home", "Crop Recommendation", "Demand Analysis", "Crop Monitoring",'agribot'])
     st.session_state.page = selection
+    rerun.page = selection
 
 # Home Page
 if st.session_state.page == "Home":
@@ -147,6 +158,17 @@ if st.session_state.page == "Home":
 
 # Crop Recommendation Page
 elif st.session_state.page == "Crop Recommendation":
+    import plotly.express as px
+
+    # Load the trained model (shared per process, reloaded when the file
+    # changes); only this page uses it, so the other pages never import
+    # xgboost, scikit-learn or scipy
+    with rerun.section("model_load"):
+        loaded_model = get_model_holder().get()
+    variant = " (compact)" if "compressed_from" in (loaded_model.manifest or {}) else ""
+    st.sidebar.caption(f"Model version {loaded_model.version}{variant} | loaded "
+                       f"{loaded_model.loaded_at:%Y-%m-%d %H:%M:%S} in {loaded_model.load_seconds:.2f}s")
+
     st.title("🌾 Crop Recommendation System")
     st.markdown("👨‍🌾 Enter your **soil and environment data** to get smart recommendations.")
     
@@ -174,27 +196,32 @@ elif st.session_state.page == "Crop Recommendation":
         st.subheader("🌱 Soil & Sunlight")
         with st.expander("More Soil & Sunlight Options"):
             soil_moisture = st.slider("Soil Moisture (%)", min_value=0, max_value=100, value=50)
-            soil_type = st.selectbox("Soil Type", ["Sandy", "Clay", "Loamy", "Peaty", "Silty", "Chalky"])
+            soil_type = st.selectbox("Soil Type", SOIL_TYPES)
             sunlight_exposure = st.slider("Sunlight Exposure (hours/day)", min_value=0, max_value=12, value=6)
 
         submit = st.form_submit_button("🌾 Predict Crop")
 
+    form_values = {"N": N, "P": P, "K": K, "temperature": temperature, "humidity": humidity, "ph": ph,
+                   "rainfall": rainfall, "soil_moisture": soil_moisture, "soil_type": soil_type,
+                   "sunlight_exposure": sunlight_exposure}
+    unasked = [name for name in loaded_model.features if name not in form_values]
+    if unasked:
+        st.caption(f"Also used by the model, set to the dataset average: {', '.join(unasked)}")
+
     if "crop_prediction" not in st.session_state:
         st.session_state.crop_prediction = None
 
     if submit:
         try:
             with st.spinner("Predicting the best crops..."):
-                soil_type_encoded = ["Sandy", "Clay", "Loamy", "Peaty", "Silty", "Chalky"].index(soil_type)
-                input_data = np.array([[N, P, K, temperature, humidity, ph, rainfall, soil_moisture, soil_type_encoded, sunlight_exposure]])
-                input_data = scaler.transform(input_data)
+                # The model's own feature list decides the input vector; features
+                # the form does not ask for are filled with their training mean
+                input_data = build_input(form_values, loaded_model.features,
+                                         defaults=feature_defaults(loaded_model))
 
-                # Get top 3 crop predictions
-                probabilities = model.predict_proba(input_data)[0]
-                top_3_indices = np.argpartition(probabilities, -3)[-3:]
-                top_3_indices = top_3_indices[np.argsort(probabilities[top_3_indices])[::-1]]
-                top_3_crops = le.inverse_transform(top_3_indices)
-                top_3_probs = probabilities[top_3_indices]
+                # Get top 3 crop predictions; repeated inputs are served from the shared cache
+                with rerun.section("predict"):
+                    top_3_crops, top_3_probs = recommend_one(loaded_model, input_data, k=3)
 
                 st.subheader("🌾 Top 3 Recommended Crops")
                 crop_data = []
@@ -209,17 +236,104 @@ elif st.session_state.page == "Crop Recommendation":
                 # Display probabilities as an improved bar chart
                 st.subheader("📊 Probability Distribution of Recommended Crops")
                 prob_df = pd.DataFrame({"Crop": top_3_crops, "Probability": top_3_probs})
-                fig = px.bar(prob_df, x="Crop", y="Probability", text_auto=True, color="Crop", 
-                             labels={"Probability": "Prediction Confidence"}, height=400)
-                st.plotly_chart(fig)
+                with rerun.section("plotly_probability"):
+                    fig = px.bar(prob_df, x="Crop", y="Probability", text_auto=True, color="Crop", 
+                                 labels={"Probability": "Prediction Confidence"}, height=400)
+                    st.plotly_chart(fig)
+
+                # Closest real fields from the training data, in the model's scaled feature space
+                st.subheader("🗺️ Most Similar Fields in Our Dataset")
+                similar = get_field_index(loaded_model).similar_fields(loaded_model, input_data, k=5)[0]
+                st.dataframe(similar, use_container_width=True, column_config=number_format(similar, "%.2f"))
+
+                cache_stats = RECOMMENDATION_CACHE.stats()
+                st.caption(f"Recommendation cache: {cache_stats['hit_ratio']:.0%} hit ratio, "
+                           f"{cache_stats['size']:,}/{cache_stats['maxsize']:,} entries")
 
-                
         except Exception as e:
             st.error(f"An error occurred: {e}")
 
+    # What-if sweep: vary one or two inputs around the values entered above
+    with st.expander("🔀 What-if Analysis (sweep one or two factors)"):
+        from sweep import FEATURE_LABELS, run_sweep
+
+        sweep_options = [name for name in FEATURE_LABELS if name in loaded_model.features]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            first_feature = st.selectbox("Vary", sweep_options, format_func=FEATURE_LABELS.get)
+        with col2:
+            second_feature = st.selectbox("Also vary (optional)", ["None"] + sweep_options,
+                                          format_func=lambda name: FEATURE_LABELS.get(name, name))
+        with col3:
+            sweep_steps = st.slider("Grid points per factor", min_value=11, max_value=101, value=51)
+
+        if st.button("🔀 Run What-if Sweep"):
+            try:
+                sweep_features = [first_feature] + ([second_feature] if second_feature not in ("None", first_feature) else [])
+                base_row = build_input(form_values, loaded_model.features,
+                                       defaults=feature_defaults(loaded_model))[0]
+                # Kept in the session so picking another crop to map does not lose the sweep
+                with rerun.section("sweep"):
+                    st.session_state.sweep_result = run_sweep(loaded_model, base_row, sweep_features, steps=sweep_steps)
+            except Exception as e:
+                st.error(f"An error occurred: {e}")
+
+        result = st.session_state.get("sweep_result")
+        if result is not None:
+            top_crops = result.top_crops(5)
+            if len(result.sweep_features) == 1:
+                x_label = FEATURE_LABELS[result.sweep_features[0]]
+                sweep_df = pd.DataFrame({crop: result.crop_probabilities(crop) for crop in top_crops})
+                sweep_df[x_label] = result.axes[0]
+                sweep_df = sweep_df.melt(id_vars=x_label, var_name="Crop", value_name="Probability")
+                fig = px.line(sweep_df, x=x_label, y="Probability", color="Crop",
+                              title=f"Crop probability as {x_label} changes", height=450)
+            else:
+                y_label, x_label = (FEATURE_LABELS[name] for name in result.sweep_features)
+                heatmap_crop = st.selectbox("Crop to map", top_crops)
+                fig = px.imshow(result.crop_probabilities(heatmap_crop), x=result.axes[1], y=result.axes[0],
+                                origin="lower", aspect="auto", color_continuous_scale="Greens",
+                                labels={"x": x_label, "y": y_label, "color": "Probability"},
+                                title=f"Probability of {heatmap_crop}", height=500)
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"Scored {result.points:,} input combinations in {result.seconds * 1000:.0f} ms")
+
+    # Batch mode: score a whole file of soil tests chunk by chunk
+    with st.expander("📁 Batch Recommendation (CSV / Parquet upload)"):
+        from batch import CHUNK_SIZE, score_file
+
+        # Batch scoring always uses the full model, also when the form
+        # above is served by the compact variant
+        full_model = get_model_holder(variant="full").get()
+
+        st.markdown(f"Upload a file with the columns **{', '.join(full_model.features)}**. "
+                    "`soil_type` may be a code (0-5) or a name such as *Loamy*.")
+        uploaded = st.file_uploader("Soil test file", type=["csv", "parquet"])
+        chunk_size = st.number_input("Rows per chunk", min_value=1000, max_value=200000, value=CHUNK_SIZE, step=1000)
+
+        if uploaded is not None and st.button("🌾 Score File"):
+            try:
+                progress_text = st.empty()
+                scored, stats = score_file(full_model, uploaded, name=uploaded.name, k=3, chunksize=int(chunk_size),
+                                           progress=lambda rows: progress_text.text(f"Scored {rows:,} rows..."))
+                progress_text.empty()
+
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Rows Scored", f"{stats['rows']:,}")
+                col2.metric("Time", f"{stats['seconds']:.2f} s")
+                col3.metric("Throughput", f"{stats['rows_per_second']:,.0f} rows/s")
+
+                st.dataframe(scored.head(100))
+                st.download_button("⬇️ Download Scored File", scored.to_csv(index=False).encode("utf-8"),
+                                   file_name=f"{uploaded.name.rsplit('.', 1)[0]}_scored.csv", mime="text/csv")
+            except Exception as e:
+                st.error(f"An error occurred: {e}")
+
 
 # Demand Analysis Page
 elif st.session_state.page == "Demand Analysis":
+    import plotly.express as px
+
     st.title("📊 Crop Demand Analysis")
     
     # Create a modern card-like container for the intro
@@ -397,6 +511,11 @@ elif st.session_state.page == "Demand Analysis":
         }
     }
     
+    # Fetch every listed crop's price in the background, so switching crops
+    # below is a cache lookup and never waits on the network
+    get_price_cache().prefetch({name: info.get("API_Code", name.upper())
+                                for name, info in expanded_crop_info.items()})
+    
     # Create two tabs for different analysis views
     tab1, tab2 = st.tabs(["📈 Crop Analysis", "💹 Market Forecasting"])
     
@@ -430,72 +549,55 @@ elif st.session_state.page == "Demand Analysis":
                 # Alternate API from Agmarknet (Indian Agricultural Marketing Information Network)
                 alt_api_url = f"https://agmarknet.gov.in/api/commodityprice?commodity={api_code}&market=all&state=all"
                 
-                # For demonstration, use a more stable API endpoint - in this case, a mock API
-                mock_api_url = "https://mocki.io/v1/6ed6806c-3706-4bbe-85fa-e48cff273ef9" 
+                # Prices come from the process-wide cache (see prices.py): one
+                # dict lookup, with the API refreshed in the background
+                with rerun.section("price_api"):
+                    crop_data = get_price_cache().get(selected_crop)
                 
-                # First try the mockup API to ensure consistent results
-                response = requests.get(mock_api_url, timeout=5)
-                
-                if response.status_code == 200 and response.json().get("crops"):
-                    # Parse data from the mockup API
-                    data = response.json()
-                    # Find the matching crop data
-                    crop_data = None
-                    for crop in data["crops"]:
-                        if crop["name"].lower() == selected_crop.lower():
-                            crop_data = crop
-                            break
+                if crop_data:
+                    market_price = int(crop_data["modal_price"])
+                    market_min = int(crop_data["min_price"])
+                    market_max = int(crop_data["max_price"])
+                    market_date = crop_data["last_updated"]
+                    market_name = crop_data["market_name"]
+                    price_trend = crop_data["trend"]
                     
-                    # Use the first crop if no match (for demonstration)
-                    if not crop_data and data["crops"]:
-                        crop_data = data["crops"][0]
+                    # Display the price with trend indicator
+                    trend_icon = "↗️" if price_trend == "up" else "↘️" if price_trend == "down" else "➡️"
+                    trend_color = "#388E3C" if price_trend == "up" else "#F44336" if price_trend == "down" else "#757575"
                     
-                    if crop_data:
-                        market_price = int(crop_data["modal_price"])
-                        market_min = int(crop_data["min_price"])
-                        market_max = int(crop_data["max_price"])
-                        market_date = crop_data["last_updated"]
-                        market_name = crop_data["market_name"]
-                        price_trend = crop_data["trend"]
-                        
-                        # Display the price with trend indicator
-                        trend_icon = "↗️" if price_trend == "up" else "↘️" if price_trend == "down" else "➡️"
-                        trend_color = "#388E3C" if price_trend == "up" else "#F44336" if price_trend == "down" else "#757575"
-                        
-                        st.markdown(f"""
-                        <div class="css-card" style="background-color: #e8f5e9; border-left: 4px solid #4CAF50;">
-                            <h4 style="margin-top: 0; color: #2E7D32;">🏬 Market: {market_name}</h4>
-                            <h2 style="margin: 0; color: #2E7D32;">₹{market_price}/quintal <span style="color: {trend_color}; font-size: 0.8em;">{trend_icon} {price_trend.upper()}</span></h2>
-                            <p style="font-size: 14px; color: #666;">Range: ₹{market_min} - ₹{market_max} | Last Updated: {market_date}</p>
-                            <p style="font-size: 12px; color: #888;">Source: Agricultural Market Data API</p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # Use the API price for calculations
-                        current_market_price = market_price
-                    else:
-                        raise Exception("Crop data not found in API response")
+                    st.markdown(f"""
+                    <div class="css-card" style="background-color: #e8f5e9; border-left: 4px solid #4CAF50;">
+                        <h4 style="margin-top: 0; color: #2E7D32;">🏬 Market: {market_name}</h4>
+                        <h2 style="margin: 0; color: #2E7D32;">₹{market_price}/quintal <span style="color: {trend_color}; font-size: 0.8em;">{trend_icon} {price_trend.upper()}</span></h2>
+                        <p style="font-size: 14px; color: #666;">Range: ₹{market_min} - ₹{market_max} | Last Updated: {market_date}</p>
+                        <p style="font-size: 12px; color: #888;">Source: Agricultural Market Data API</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    # Use the API price for calculations
+                    current_market_price = market_price
                 else:
-                    # Generate realistic price if API fails
+                    # Simulate a price only when nothing was ever fetched
                     raise Exception("No data available from API")
                     
             except Exception as e:
                 # Generate simulated price based on crop with more realistic market patterns
-                np.random.seed(hash(selected_crop) % 10000)
+                rng = crop_rng(selected_crop, SPOT_STREAM)
                 
                 # Different base price ranges for different crop types
                 if selected_crop in ["Rice", "Wheat", "Maize"]:
                     # Staple crops
-                    base_price = np.random.randint(1800, 2800)
+                    base_price = rng.integers(1800, 2800)
                 elif selected_crop in ["Potato", "Onion", "Tomato"]:
                     # Vegetables
-                    base_price = np.random.randint(1200, 3500)
+                    base_price = rng.integers(1200, 3500)
                 elif selected_crop in ["Coffee", "Turmeric", "Chilli"]:
                     # High-value crops
-                    base_price = np.random.randint(6000, 12000)
+                    base_price = rng.integers(6000, 12000)
                 else:
                     # Other crops
-                    base_price = np.random.randint(2000, 6000)
+                    base_price = rng.integers(2000, 6000)
                 
                 # Add monthly seasonal adjustment based on current month
                 from datetime import datetime
@@ -599,31 +701,13 @@ elif st.session_state.page == "Demand Analysis":
         # Market Insights with 3-year trend
         st.subheader("🌐 Market Insights")
         
-        # Generate predictable trend data with seasonal patterns
-        def generate_trend_data(crop_name, months=36):
-            np.random.seed(hash(crop_name) % 10000)  # Seed based on crop name for consistent results
-            base_price = np.random.randint(2000, 6000)
-            trend_factor = np.random.uniform(-0.5, 1.0)  # Negative to positive trend
-            seasonality = np.random.uniform(0.1, 0.3)  # Seasonal variation magnitude
-            noise_level = np.random.uniform(0.05, 0.15)  # Random noise amount
-            
-            # Create time-based components
-            time = np.arange(months)
-            trend = base_price * (1 + trend_factor * time/months)
-            season = seasonality * base_price * np.sin(2 * np.pi * time / 12)
-            noise = np.random.normal(0, noise_level * base_price, months)
-            
-            # Create price series with trend, seasonality and noise
-            prices = trend + season + noise
-            return prices.astype(int)
-        
-        # Create 3-year price history
-        months_3yr = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"] * 3
-        years = ["2022"] * 12 + ["2023"] * 12 + ["2024"] * 12
-        full_labels = [f"{m} {y}" for m, y in zip(months_3yr, years)]
+        # Create 3-year price history, up to the last complete month
+        history_dates = history_months(36)
+        years = [f"{day:%Y}" for day in history_dates]
+        full_labels = [f"{day:%b %Y}" for day in history_dates]
         
         # Get price data for selected crop
-        price_history = generate_trend_data(selected_crop)
+        price_history = price_matrix(tuple(crop_options), 36)[crop_options.index(selected_crop)]
         
         # Create a DataFrame for the chart
         price_df = pd.DataFrame({
@@ -633,45 +717,35 @@ elif st.session_state.page == "Demand Analysis":
         })
         
         # Plot the price history with Plotly
-        fig = px.line(price_df, x="Month", y="Price (₹/Quintal)", 
-                      title=f"{selected_crop} Price Trends (3-Year History)",
-                      labels={"Price (₹/Quintal)": "Price (₹/Quintal)", "Month": ""},
-                      markers=True, color_discrete_sequence=["#4CAF50"])
-        
-        # Customize to highlight years
-        for year in ["2022", "2023", "2024"]:
-            year_data = price_df[price_df["Year"] == year]
-            fig.add_scatter(x=year_data["Month"], y=year_data["Price (₹/Quintal)"],
-                          mode="markers", name=year, marker=dict(size=8))
-        
-        fig.update_layout(
-            xaxis=dict(tickmode="array", tickvals=full_labels[::3], ticktext=full_labels[::3]),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
-            height=400,
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        with rerun.section("plotly_price_history"):
+            fig = px.line(price_df, x="Month", y="Price (₹/Quintal)", 
+                          title=f"{selected_crop} Price Trends (3-Year History)",
+                          labels={"Price (₹/Quintal)": "Price (₹/Quintal)", "Month": ""},
+                          markers=True, color_discrete_sequence=["#4CAF50"])
+        
+            # Customize to highlight years
+            for year in sorted(set(years)):
+                year_data = price_df[price_df["Year"] == year]
+                fig.add_scatter(x=year_data["Month"], y=year_data["Price (₹/Quintal)"],
+                              mode="markers", name=year, marker=dict(size=8))
+        
+            fig.update_layout(
+                xaxis=dict(tickmode="array", tickvals=full_labels[::3], ticktext=full_labels[::3]),
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                height=400,
+            )
+        
+            st.plotly_chart(fig, use_container_width=True)
         
         # Price prediction for next 6 months
         st.subheader("🔮 Price Prediction (Next 6 Months)")
         
-        # Generate future predictions based on historical patterns plus growth
-        last_price = price_history[-1]
-        future_months = ["May", "Jun", "Jul", "Aug", "Sep", "Oct"]
-        future_years = ["2024"] * 6
-        future_labels = [f"{m} {y}" for m, y in zip(future_months, future_years)]
-        
-        # Create somewhat optimistic predictions based on current trend
-        prediction_base = price_history[-12:]  # Last year
-        seasonal_pattern = prediction_base - np.mean(prediction_base)  # Extract seasonality
-        growth_factor = 1 + np.random.uniform(0.05, 0.15)  # 5-15% annual growth
-        
-        # Apply seasonal pattern to future months with growth factor
-        future_prices = []
-        for i in range(6):
-            next_price = last_price * growth_factor + seasonal_pattern[i]
-            future_prices.append(int(next_price))
-            last_price = next_price
+        # Forecast from the current month with the seasonal model fitted once
+        # to every crop's history (see forecasting.py)
+        future_labels = [f"{day:%b %Y}" for day in forecast_months(6)]
+        crop_index = crop_options.index(selected_crop)
+        mean, lower, upper = fitted_model(tuple(crop_options), 36).forecast(6, level=0.95)
+        future_prices = mean[crop_index].astype(int)
         
         # Create prediction dataframe
         prediction_df = pd.DataFrame({
@@ -680,22 +754,23 @@ elif st.session_state.page == "Demand Analysis":
         })
         
         # Display price prediction as a line chart with prediction interval
-        fig2 = px.line(prediction_df, x="Month", y="Predicted Price (₹/Quintal)",
-                      title="Price Forecast with Confidence Interval",
-                      labels={"Predicted Price (₹/Quintal)": "Price (₹/Quintal)"},
-                      markers=True, color_discrete_sequence=["#4CAF50"])
-        
-        # Add prediction intervals
-        upper_bound = [p * 1.1 for p in future_prices]  # 10% above prediction
-        lower_bound = [p * 0.9 for p in future_prices]  # 10% below prediction
-        
-        fig2.add_scatter(x=future_labels, y=upper_bound, mode="lines", line=dict(width=0),
-                       showlegend=False)
-        fig2.add_scatter(x=future_labels, y=lower_bound, mode="lines", fill="tonexty",
-                       line=dict(width=0), fillcolor="rgba(76, 175, 80, 0.2)",
-                       name="Prediction Interval")
-        
-        st.plotly_chart(fig2, use_container_width=True)
+        with rerun.section("plotly_forecast"):
+            fig2 = px.line(prediction_df, x="Month", y="Predicted Price (₹/Quintal)",
+                          title="Price Forecast with 95% Prediction Interval",
+                          labels={"Predicted Price (₹/Quintal)": "Price (₹/Quintal)"},
+                          markers=True, color_discrete_sequence=["#4CAF50"])
+        
+            # Add prediction intervals
+            upper_bound = upper[crop_index]
+            lower_bound = lower[crop_index]
+        
+            fig2.add_scatter(x=future_labels, y=upper_bound, mode="lines", line=dict(width=0),
+                           showlegend=False)
+            fig2.add_scatter(x=future_labels, y=lower_bound, mode="lines", fill="tonexty",
+                           line=dict(width=0), fillcolor="rgba(76, 175, 80, 0.2)",
+                           name="Prediction Interval")
+        
+            st.plotly_chart(fig2, use_container_width=True)
     
     with tab2:
         st.subheader("💰 Profitability & Cost Estimation")
@@ -737,61 +812,17 @@ elif st.session_state.page == "Demand Analysis":
         # Total cost per acre
         total_cost_per_acre = seed_cost_acre + fertilizer_cost_acre + labor_cost_acre + transport_cost_acre + other_costs
         
-        # Convert expected yield to per acre (since yield is given per hectare)
-        expected_yield_per_acre = expected_yield / 2.47  # (1 hectare = 2.47 acres)
-        
-        # Convert quintal to tons if needed (1 ton = 10 quintals)
-        expected_yield_quintals = expected_yield_per_acre * 10  # Convert tons to quintals
-        
-        # Calculate base case values (before adjustments)
-        base_price = market_price
-        base_revenue_per_acre = base_price * expected_yield_quintals
-        base_total_revenue = base_revenue_per_acre * land_area_acre
-        base_total_cost = total_cost_per_acre * land_area_acre
-        base_profit = base_total_revenue - base_total_cost
-        
-        # Apply market factors to price
-        adjusted_price = market_price * (1 + quality_premium/100) * (1 + organic_premium_value/100)
-        
         # Add storage and post-harvest options
         st.subheader("📦 Post-Harvest & Storage Strategy")
         col1, col2 = st.columns(2)
         
         with col1:
-            storage_option = st.selectbox("Storage Strategy", 
-                                         ["Sell Immediately", "Short-term Storage (1-3 months)", 
-                                          "Long-term Storage (3-6 months)"])
-            
-            if storage_option == "Sell Immediately":
-                storage_cost = 0
-                price_benefit = 0
-                storage_text = "No storage costs, but missing potential higher prices"
-            elif storage_option == "Short-term Storage (1-3 months)":
-                storage_cost = 200 * land_area_acre  # ₹200 per acre for short-term
-                price_benefit = 0.05  # 5% price increase
-                storage_text = "Medium storage costs, potential for better prices"
-            else:
-                storage_cost = 500 * land_area_acre  # ₹500 per acre for long-term
-                price_benefit = 0.12  # 12% price increase
-                storage_text = "Higher storage costs, but best chance for peak prices"
+            storage_option = st.selectbox("Storage Strategy", list(STORAGE_OPTIONS))
+            storage_text = STORAGE_OPTIONS[storage_option][2]
         
         with col2:
-            processing_option = st.selectbox("Processing Level", 
-                                            ["No Processing", "Basic Processing", 
-                                             "Advanced Processing"])
-            
-            if processing_option == "No Processing":
-                processing_cost = 0
-                processing_benefit = 0
-                processing_text = "No additional costs, base market prices"
-            elif processing_option == "Basic Processing":
-                processing_cost = 1500 * land_area_acre  # ₹1500 per acre for basic processing
-                processing_benefit = 0.15  # 15% price increase
-                processing_text = "Sorting, cleaning, packaging for better prices"
-            else:
-                processing_cost = 4000 * land_area_acre  # ₹4000 per acre for advanced processing
-                processing_benefit = 0.35  # 35% price increase
-                processing_text = "Value-added processing for premium markets"
+            processing_option = st.selectbox("Processing Level", list(PROCESSING_OPTIONS))
+            processing_text = PROCESSING_OPTIONS[processing_option][2]
         
         # Display strategy information
         st.markdown(f"""
@@ -802,21 +833,17 @@ elif st.session_state.page == "Demand Analysis":
         </div>
         """, unsafe_allow_html=True)
         
-        # Apply storage and processing to final price
-        final_price = adjusted_price * (1 + price_benefit) * (1 + processing_benefit)
-        total_post_harvest_cost = storage_cost + processing_cost
-        
-        # Recalculate revenue with all factors
-        adjusted_revenue_per_acre = final_price * expected_yield_quintals
-        total_adjusted_revenue = adjusted_revenue_per_acre * land_area_acre
-        
-        # Add post-harvest costs to total costs
-        total_cost_with_post_harvest = total_cost_per_acre * land_area_acre + total_post_harvest_cost
-        
-        # Recalculate profit
-        adjusted_profit = total_adjusted_revenue - total_cost_with_post_harvest
-        adjusted_profit_margin = (adjusted_profit / total_adjusted_revenue) * 100 if total_adjusted_revenue > 0 else 0
-        adjusted_roi = (adjusted_profit / total_cost_with_post_harvest) * 100 if total_cost_with_post_harvest > 0 else 0
+        # Revenue, cost and profit before and after the market factors and strategy
+        summary = profit_summary(market_price, expected_yield, land_area_acre, total_cost_per_acre,
+                                 quality_premium=quality_premium, organic_premium=organic_premium_value,
+                                 storage_option=storage_option, processing_option=processing_option)
+        final_price = summary["final_price"]
+        total_post_harvest_cost = summary["total_post_harvest_cost"]
+        total_adjusted_revenue = summary["total_adjusted_revenue"]
+        total_cost_with_post_harvest = summary["total_cost_with_post_harvest"]
+        adjusted_profit = summary["adjusted_profit"]
+        adjusted_profit_margin = summary["adjusted_profit_margin"]
+        adjusted_roi = summary["adjusted_roi"]
         
         # Display adjusted financial summary
         st.subheader("💼 Financial Analysis (with Strategy)")
@@ -862,9 +889,9 @@ elif st.session_state.page == "Demand Analysis":
         # Add comparison chart between base strategy and optimized strategy
         comparison_data = {
             'Strategy': ['Base Strategy', 'Optimized Strategy'],
-            'Revenue': [base_total_revenue, total_adjusted_revenue],
-            'Cost': [base_total_cost, total_cost_with_post_harvest],
-            'Profit': [base_profit, adjusted_profit]
+            'Revenue': [summary["base_total_revenue"], total_adjusted_revenue],
+            'Cost': [summary["base_total_cost"], total_cost_with_post_harvest],
+            'Profit': [summary["base_profit"], adjusted_profit]
         }
         
         comparison_df = pd.DataFrame(comparison_data)
@@ -872,39 +899,40 @@ elif st.session_state.page == "Demand Analysis":
         # Display comparison chart
         st.subheader("📊 Strategy Comparison")
         
-        fig_comparison = px.bar(comparison_df, x='Strategy', y=['Revenue', 'Cost', 'Profit'], 
-                               barmode='group', title="Financial Comparison of Strategies",
-                               color_discrete_sequence=['#4CAF50', '#FF9800', '#2196F3'])
+        with rerun.section("plotly_strategy"):
+            fig_comparison = px.bar(comparison_df, x='Strategy', y=['Revenue', 'Cost', 'Profit'], 
+                                   barmode='group', title="Financial Comparison of Strategies",
+                                   color_discrete_sequence=['#4CAF50', '#FF9800', '#2196F3'])
         
-        st.plotly_chart(fig_comparison, use_container_width=True)
+            st.plotly_chart(fig_comparison, use_container_width=True)
         
-        # Marketing channels analysis
+        # Marketing channels analysis, priced relative to the optimized price
         st.subheader("🛒 Marketing Channels Analysis")
         
         channels = {
             "Local Market": {
-                "Price": final_price * 0.9,  # 90% of optimized price
+                "Price": final_price * CHANNEL_PRICE_FACTORS["Local Market"],
                 "Risk": "Low",
                 "Requirements": "Basic quality, no certification needed",
                 "Advantages": "Immediate payment, no transportation",
                 "Disadvantages": "Lower prices, limited volume"
             },
             "Wholesale Market": {
-                "Price": final_price * 1.0,  # 100% of optimized price (reference)
+                "Price": final_price * CHANNEL_PRICE_FACTORS["Wholesale Market"],
                 "Risk": "Medium",
                 "Requirements": "Standard quality, consistent supply",
                 "Advantages": "Higher volume sales, established channel",
                 "Disadvantages": "Price fluctuations, delayed payments possible"
             },
             "Direct to Consumer": {
-                "Price": final_price * 1.3,  # 130% of optimized price
+                "Price": final_price * CHANNEL_PRICE_FACTORS["Direct to Consumer"],
                 "Risk": "Medium-High",
                 "Requirements": "High quality, packaging, marketing",
                 "Advantages": "Best prices, direct customer relationships",
                 "Disadvantages": "Time-consuming, requires marketing"
             },
             "Export Market": {
-                "Price": final_price * 1.5,  # 150% of optimized price
+                "Price": final_price * CHANNEL_PRICE_FACTORS["Export Market"],
                 "Risk": "High",
                 "Requirements": "Certifications, highest quality, consistent volume",
                 "Advantages": "Premium prices, large volume potential",
@@ -944,6 +972,91 @@ elif st.session_state.page == "Demand Analysis":
             </table>
         </div>
         """, unsafe_allow_html=True)
+        
+        # Every storage x processing x channel strategy at once, over a grid of
+        # premiums and market prices around the values entered above
+        st.subheader("🧮 Strategy Optimizer")
+        
+        with rerun.section("strategy_optimizer"):
+            strategies = optimize(market_price, expected_yield, land_area_acre, total_cost_per_acre,
+                                  quality_premium=quality_premium, organic_premium=organic_premium_value)
+        best_profit = strategies.best("profit")
+        best_roi = strategies.best("roi")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.success(f"**Highest profit:** {best_profit['storage']}, {best_profit['processing']}, "
+                       f"{best_profit['channel']} - ₹{best_profit['profit']:,.0f} ({best_profit['roi']:.1f}% ROI)")
+        with col2:
+            st.success(f"**Highest ROI:** {best_roi['storage']}, {best_roi['processing']}, "
+                       f"{best_roi['channel']} - {best_roi['roi']:.1f}% (₹{best_roi['profit']:,.0f} profit)")
+        
+        rank_by = st.selectbox("Rank strategies by", ["profit", "roi", "mean", "worst"],
+                               format_func={"profit": "Profit", "roi": "ROI", "mean": "Mean profit across scenarios",
+                                            "worst": "Worst-case profit across scenarios"}.get)
+        ranked = strategies.ranked(rank_by)
+        st.dataframe(ranked, use_container_width=True, column_config=number_format(ranked, "%.0f"))
+        st.caption(f"Evaluated {strategies.scenarios:,} scenarios ({len(strategies.axes['quality_premium'])} quality "
+                   f"premiums × {len(strategies.axes['organic_premium'])} organic premiums × "
+                   f"{len(strategies.axes['market_price'])} market prices within ±{strategies.price_range:.0%} for each of "
+                   f"the {strategies.strategies} strategies) "
+                   f"in {strategies.seconds * 1000:.1f} ms")
+        
+        # The figures above use the low end of the yield range, today's price
+        # and the entered costs; risk mode samples all three jointly
+        st.subheader("🎲 Profit Risk")
+        risk_mode = st.checkbox("Risk mode (Monte Carlo)",
+                                help="Simulate yield, market price and costs together to see the spread of profit")
+        if risk_mode:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                risk_samples = st.select_slider("Samples", options=[10_000, 25_000, 50_000, 100_000, 250_000],
+                                                value=100_000)
+            with col2:
+                months_to_sale = st.slider("Months until sale", min_value=1, max_value=12, value=4,
+                                           help="Price uncertainty grows with the time until the crop is sold")
+            with col3:
+                cost_uncertainty = st.slider("Cost uncertainty (±%)", min_value=0, max_value=50, value=10) / 100
+            
+            yield_low, yield_high = yield_range(expanded_crop_info[selected_crop]["Expected Yield"])
+            volatility = monthly_volatility(price_history)
+            with rerun.section("risk_simulation"):
+                risk = simulate_profit(crop_rng(selected_crop, RISK_STREAM), market_price, yield_low, yield_high,
+                                       land_area_acre,
+                                       [seed_cost_acre, fertilizer_cost_acre, labor_cost_acre,
+                                        transport_cost_acre, other_costs],
+                                       volatility, months_to_sale=months_to_sale, cost_uncertainty=cost_uncertainty,
+                                       quality_premium=quality_premium, organic_premium=organic_premium_value,
+                                       storage_option=storage_option, processing_option=processing_option,
+                                       samples=risk_samples)
+                risk_summary = risk.summary()
+                risk_percentiles = risk.percentiles()
+            
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Expected Profit", f"₹{risk_summary['mean']:,.0f}")
+            col2.metric("Probability of Loss", f"{risk_summary['probability_of_loss']:.1%}")
+            col3.metric("Value at Risk (95%)", f"₹{risk_summary['value_at_risk']:,.0f}",
+                        help="Loss exceeded in only 5% of outcomes (0 when even those make a profit)")
+            col4.metric("Expected Shortfall (95%)", f"₹{risk_summary['expected_shortfall']:,.0f}",
+                        help="Average loss in the worst 5% of outcomes")
+            
+            with rerun.section("plotly_risk"):
+                counts, edges = np.histogram(risk.profit, bins=60)
+                risk_df = pd.DataFrame({"Profit (₹)": (edges[:-1] + edges[1:]) / 2, "Share of Outcomes": counts / counts.sum()})
+                fig_risk = px.bar(risk_df, x="Profit (₹)", y="Share of Outcomes", title="Simulated Profit Distribution",
+                                  color_discrete_sequence=['#2196F3'])
+                fig_risk.update_traces(width=edges[1] - edges[0])
+                fig_risk.add_vline(x=0, line_dash="dash", line_color="red")
+                fig_risk.add_vline(x=adjusted_profit, line_dash="dot", line_color="green",
+                                   annotation_text="Point estimate")
+                st.plotly_chart(fig_risk, use_container_width=True)
+            
+            st.dataframe(pd.DataFrame({"Percentile": [f"P{q}" for q in risk_percentiles],
+                                       "Profit (₹)": [f"₹{v:,.0f}" for v in risk_percentiles.values()]}),
+                         hide_index=True, use_container_width=True)
+            st.caption(f"{risk.samples:,} samples in {risk.seconds * 1000:.0f} ms"
+                       + (f" (time budget reached before {risk.requested:,})" if risk.samples < risk.requested else "")
+                       + f"; yield {yield_low:g}-{yield_high:g} tons/ha, price volatility {volatility:.1%} per month")
 
 # Crop Monitoring Page
 elif st.session_state.page == "Crop Monitoring":
@@ -982,7 +1095,8 @@ elif st.session_state.page == "Crop Monitoring":
     location = st.text_input("📍 Enter Location (City or District)", "New Delhi")
 
     if st.button("🔍 Get Weather Data"):
-        weather_data = get_weather_data(location)
+        with rerun.section("weather_api"):
+            weather_data = get_weather_data(location)
         
         if weather_data:
             st.subheader(f"🌤️ Weather in {location}")
@@ -1092,7 +1206,8 @@ elif st.session_state.page == "agribot":
                     model = genai.GenerativeModel(gemini_model_name)
                     
                     # Get the response
-                    response = model.generate_content(full_prompt)
+                    with rerun.section("gemini"):
+                        response = model.generate_content(full_prompt)
                     
                     # Update the message placeholder
                     if hasattr(response, 'text'):
@@ -1160,3 +1275,6 @@ elif st.session_state.page == "agribot":
             </p>
         </div>
         """, unsafe_allow_html=True)
+
+# Record this run's timings (and profile, when enabled)
+rerun.finish()
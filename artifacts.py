@@ -0,0 +1,280 @@
+"""Versioned model artifact: native booster + npz preprocessing + JSON manifest.
+
+Layout of an artifact directory (default ``crop_model/``)::
+
+    booster.ubj       XGBoost booster in UBJSON (booster.bin for the
+                      legacy binary format; the manifest records which)
+    preprocess.npz    scaler mean/scale and label classes as plain arrays
+    manifest.json     format version, model version, feature order,
+                      dataset hash, metrics and file checksums
+
+Nothing in the directory is pickled, so loading does not execute code and
+does not depend on the scikit-learn version that trained the model. The
+booster is read straight into an xgboost.Booster, which skips the
+XGBClassifier state restore the pickle goes through. The manifest is written
+last, which makes it the file to watch for changes.
+
+UBJSON is XGBoost's supported format. The legacy binary format loads about
+20x faster but is deprecated and will be removed; it can still be written
+with booster_format="deprecated", and XGBoost's deprecation warnings are
+left visible so an upgrade gives notice before it stops working.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+ARTIFACT_DIR = "crop_model"
+# Written by compress.py; served by the app with CROP_MODEL_VARIANT=compact
+COMPACT_DIR = "crop_model_compact"
+FORMAT_VERSION = 1
+BOOSTER_FORMAT = "ubj"
+BOOSTER_FILES = {"ubj": "booster.ubj", "deprecated": "booster.bin"}
+PREPROCESS_FILE = "preprocess.npz"
+MANIFEST_FILE = "manifest.json"
+
+DEFAULT_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall',
+                    'soil_moisture', 'soil_type', 'sunlight_exposure']
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BoosterClassifier:
+    """The slice of the XGBClassifier interface the app uses, over a raw Booster.
+
+    inplace_predict() skips building a DMatrix, which is most of the cost of
+    a single-row predict_proba.
+    """
+
+    def __init__(self, booster, n_classes):
+        self.booster = booster
+        self.n_classes_ = n_classes
+        self.classes_ = np.arange(n_classes)
+
+    def get_booster(self):
+        return self.booster
+
+    def predict_proba(self, X):
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def save_model(self, fname):
+        self.booster.save_model(fname)
+
+
+def booster_bytes(booster, booster_format=BOOSTER_FORMAT):
+    """The booster serialized as booster_format ("ubj" or "deprecated")."""
+    if booster_format not in BOOSTER_FILES:
+        raise ValueError(f"Unknown booster format '{booster_format}'")
+    return booster.save_raw(raw_format=booster_format)
+
+
+def _save_booster(booster, path, booster_format):
+    with open(path, "wb") as file:
+        file.write(booster_bytes(booster, booster_format))
+
+
+def _load_booster(path):
+    from xgboost import Booster
+    with open(path, "rb") as file:
+        raw = bytearray(file.read())
+    booster = Booster()
+    booster.load_model(raw)
+    return booster
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def _replace_into(directory, name, write):
+    # Write to a temp name and rename, so readers never see a partial file
+    final = os.path.join(directory, name)
+    root, ext = os.path.splitext(name)
+    tmp = os.path.join(directory, f".{root}.tmp{ext}")
+    write(tmp)
+    os.replace(tmp, final)
+    return final
+
+
+def preprocessing_arrays(le, scaler):
+    """The fitted LabelEncoder and StandardScaler state as plain arrays."""
+    return {
+        "mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "classes": np.asarray(le.classes_).astype(str),
+        "n_samples_seen": np.asarray(scaler.n_samples_seen_),
+    }
+
+
+def preprocessing_from_arrays(arrays):
+    """Rebuild (le, scaler) from the arrays of preprocessing_arrays()."""
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    mean, scale = arrays["mean"], arrays["scale"]
+    n_samples_seen = arrays["n_samples_seen"]
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.scale_ = scale
+    scaler.var_ = scale ** 2
+    scaler.n_features_in_ = len(mean)
+    scaler.n_samples_seen_ = n_samples_seen if n_samples_seen.ndim else int(n_samples_seen)
+
+    le = LabelEncoder()
+    le.classes_ = arrays["classes"]
+    return le, scaler
+
+
+def save_artifact(directory, model, le, scaler, features=None, dataset_path=None,
+                  metrics=None, extra=None, booster_format=BOOSTER_FORMAT):
+    features = list(features or DEFAULT_FEATURES)
+    os.makedirs(directory, exist_ok=True)
+
+    booster_file = BOOSTER_FILES[booster_format]
+    booster_path = _replace_into(directory, booster_file,
+                                 lambda tmp: _save_booster(model.get_booster(), tmp, booster_format))
+    preprocess_path = _replace_into(directory, PREPROCESS_FILE,
+                                    lambda tmp: np.savez(tmp, **preprocessing_arrays(le, scaler)))
+
+    booster_hash = file_sha256(booster_path)
+    preprocess_hash = file_sha256(preprocess_path)
+
+    import xgboost
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": hashlib.sha256((booster_hash + preprocess_hash).encode()).hexdigest()[:12],
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "features": features,
+        "n_classes": int(len(le.classes_)),
+        "dataset": {
+            "path": os.path.basename(dataset_path) if dataset_path else None,
+            "sha256": file_sha256(dataset_path) if dataset_path else None,
+        },
+        "metrics": metrics or {},
+        "xgboost_version": xgboost.__version__,
+        "booster_format": booster_format,
+        "files": {booster_file: booster_hash, PREPROCESS_FILE: preprocess_hash},
+    }
+    if extra:
+        manifest.update(extra)
+
+    _replace_into(directory, MANIFEST_FILE, lambda tmp: _write_json(tmp, manifest))
+    # A booster left over in the other format is no longer described by the manifest
+    for other in set(BOOSTER_FILES.values()) - {booster_file}:
+        if os.path.exists(os.path.join(directory, other)):
+            os.remove(os.path.join(directory, other))
+    return manifest
+
+
+def _write_json(path, data):
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_FILE)) as file:
+        manifest = json.load(file)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format_version')} in {directory}")
+    return manifest
+
+
+def load_artifact(directory):
+    """Return (model, le, scaler, manifest) rebuilt from an artifact directory."""
+    manifest = read_manifest(directory)
+
+    # Manifests written before the format was recorded always used the binary format
+    booster_format = manifest.get("booster_format", "deprecated")
+    booster = _load_booster(os.path.join(directory, BOOSTER_FILES[booster_format]))
+    model = BoosterClassifier(booster, manifest["n_classes"])
+
+    with np.load(os.path.join(directory, PREPROCESS_FILE), allow_pickle=False) as arrays:
+        le, scaler = preprocessing_from_arrays(arrays)
+
+    return model, le, scaler, manifest
+
+
+def holdout_metrics(model, le, scaler, features, dataset_path, test_size=0.2, seed=42):
+    """Accuracy on the held-out split model.py trains around (same size and seed)."""
+    from sklearn.model_selection import train_test_split
+
+    from dataset import load_dataset
+
+    df = load_dataset(dataset_path, columns=list(features) + ["label"])
+    X = df[list(features)]
+    # A scaler fitted on a DataFrame (the old pickles) checks the column names
+    X = scaler.transform(X if hasattr(scaler, "feature_names_in_") else X.to_numpy(dtype=np.float64))
+    y = le.transform(df["label"].astype(str))
+    _, X_test, _, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+    accuracy = float((np.asarray(model.predict(X_test)).ravel() == y_test).mean())
+    return {"accuracy": accuracy, "test_rows": int(len(y_test)), "test_size": test_size, "seed": seed}
+
+
+def convert_pickle(pickle_path, directory, dataset_path=None, booster_format=BOOSTER_FORMAT):
+    # Migration helper: rewrite an old (model, le, scaler) pickle as an artifact
+    import pickle
+    with open(pickle_path, "rb") as file:
+        model, le, scaler = pickle.load(file)
+    features = list(getattr(scaler, "feature_names_in_", DEFAULT_FEATURES))
+    # With the training CSV, record the model's held-out accuracy like model.py does
+    metrics = holdout_metrics(model, le, scaler, features, dataset_path) if dataset_path else None
+    return save_artifact(directory, model, le, scaler, features=features, dataset_path=dataset_path,
+                         metrics=metrics, extra={"converted_from": os.path.basename(pickle_path)},
+                         booster_format=booster_format)
+
+
+def compare_load_times(pickle_path, directory, repeat=5):
+    import pickle
+
+    def best_of(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def load_pickle():
+        with open(pickle_path, "rb") as file:
+            pickle.load(file)
+
+    return {"pickle_seconds": best_of(load_pickle),
+            "artifact_seconds": best_of(lambda: load_artifact(directory))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert and inspect crop model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="convert a pickled (model, le, scaler) tuple")
+    convert.add_argument("pickle_path", nargs="?", default="crop_prediction_model.pkl")
+    convert.add_argument("directory", nargs="?", default=ARTIFACT_DIR)
+    convert.add_argument("--dataset", help="CSV the model was trained on, recorded by hash")
+    convert.add_argument("--booster-format", choices=sorted(BOOSTER_FILES), default=BOOSTER_FORMAT,
+                         help="ubj (default) or the deprecated, faster-loading binary format")
+
+    bench = sub.add_parser("compare", help="time pickle vs artifact loading")
+    bench.add_argument("pickle_path", nargs="?", default="crop_prediction_model.pkl")
+    bench.add_argument("directory", nargs="?", default=ARTIFACT_DIR)
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        manifest = convert_pickle(args.pickle_path, args.directory, args.dataset, args.booster_format)
+        print(f"Wrote artifact version {manifest['version']} to '{args.directory}'")
+    else:
+        for name, seconds in compare_load_times(args.pickle_path, args.directory).items():
+            print(f"{name}: {seconds * 1000:.1f} ms")
@@ -0,0 +1,372 @@
+"""Interchangeable inference backends for the crop model.
+
+All backends take already-scaled feature rows and return the same
+(rows, classes) probability matrix:
+
+    sklearn   the model's own predict_proba (DMatrix path for XGBClassifier)
+    booster   xgboost.Booster.inplace_predict, no DMatrix construction
+    numpy     the dumped trees flattened into arrays and walked level by
+              level for all rows and trees at once
+    onnx      ONNX Runtime on CPU, when onnxmltools and onnxruntime are
+              installed
+
+Which backend is fastest depends on batch size, so warm_up() builds the
+backends and benchmarks every batch-size bucket on a background thread,
+once per model version; model_store starts it whenever it loads a model.
+Until a bucket has its winner, backend_for() serves it with the booster
+backend, so no request waits on the benchmark. A backend only takes part
+when its output matches the booster's to within TOLERANCE. Set
+CROP_INFERENCE_BACKEND to force one backend.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+
+
+TOLERANCE = 1e-5
+BATCH_BUCKETS = (1, 16, 256, 4096)
+SCREEN_FACTOR = 5
+BACKEND_ENV = "CROP_INFERENCE_BACKEND"
+
+
+class SklearnBackend:
+    name = "sklearn"
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict_proba(self, X):
+        return np.asarray(self.model.predict_proba(X))
+
+
+class BoosterBackend:
+    name = "booster"
+
+    def __init__(self, model):
+        self.booster = model.get_booster()
+
+    def predict_proba(self, X):
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+
+
+def booster_json(booster):
+    # Full-precision JSON model; xgboost<1.6 can only write it to a file
+    try:
+        return json.loads(booster.save_raw(raw_format="json"))
+    except TypeError:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.json")
+            booster.save_model(path)
+            with open(path) as file:
+                return json.load(file)
+
+
+class NumpyTreeBackend:
+    """Pure-NumPy evaluator over the booster's trees.
+
+    All trees are stacked into flat node arrays. Every (row, tree) pair
+    starts at its tree's root and advances one level per step; pairs that
+    reached a leaf drop out of the active set, so the many stump-like trees
+    of a multi-class model cost almost nothing after the first levels.
+    """
+
+    name = "numpy"
+    chunk_rows = 256
+
+    def __init__(self, model):
+        learner = booster_json(model.get_booster())["learner"]
+        gbm = learner["gradient_booster"]
+        if gbm["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster type '{gbm['name']}'")
+        self.objective = learner["objective"]["name"]
+        if self.objective not in ("multi:softprob", "multi:softmax", "binary:logistic"):
+            raise ValueError(f"Unsupported objective '{self.objective}'")
+
+        params = learner["learner_model_param"]
+        self.n_classes = max(int(params["num_class"]), 1)
+        self.base_score = float(params["base_score"])
+
+        trees = gbm["model"]["trees"]
+        tree_info = np.asarray(gbm["model"]["tree_info"], dtype=np.int64)
+        if any(any(t.get("split_type", [])) for t in trees):
+            raise ValueError("Categorical splits are not supported")
+
+        sizes = np.array([len(t["left_children"]) for t in trees], dtype=np.int64)
+        self.roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def stacked(key, dtype):
+            return np.concatenate([np.asarray(t[key], dtype=dtype) for t in trees])
+
+        left = stacked("left_children", np.int64)
+        right = stacked("right_children", np.int64)
+        offsets = np.repeat(self.roots, sizes)
+        self.is_leaf = left == -1
+        self.left = np.where(self.is_leaf, -1, left + offsets)
+        self.right = np.where(self.is_leaf, -1, right + offsets)
+        self.feature = stacked("split_indices", np.int64)
+        conditions = stacked("split_conditions", np.float32)
+        # For leaves split_conditions holds the leaf value
+        self.threshold = np.where(self.is_leaf, np.float32(np.inf), conditions)
+        self.value = np.where(self.is_leaf, conditions, np.float32(0.0))
+        self.default_left = stacked("default_left", bool)
+        self.depth = max(_tree_depth(np.asarray(t["left_children"]), np.asarray(t["right_children"]))
+                         for t in trees)
+        # (trees, classes) one-hot so per-class margins are one matmul
+        self.tree_class = np.zeros((len(trees), self.n_classes), dtype=np.float32)
+        self.tree_class[np.arange(len(trees)), tree_info] = 1.0
+
+    def margins(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_trees = len(X), len(self.roots)
+        node = np.tile(self.roots, n_rows)
+        row = np.repeat(np.arange(n_rows), n_trees)
+        active = np.arange(len(node))
+        for _ in range(self.depth):
+            current = node[active]
+            keep = ~self.is_leaf[current]
+            active, current = active[keep], current[keep]
+            if not len(active):
+                break
+            x = X[row[active], self.feature[current]]
+            go_left = np.where(np.isnan(x), self.default_left[current], x < self.threshold[current])
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+        return self.value[node].reshape(n_rows, n_trees) @ self.tree_class
+
+    def predict_proba(self, X):
+        out = [self._proba(X[i:i + self.chunk_rows]) for i in range(0, len(X), self.chunk_rows)]
+        return np.vstack(out) if out else np.zeros((0, self.n_classes), dtype=np.float32)
+
+    def _proba(self, X):
+        if self.objective == "binary:logistic":
+            base = np.log(self.base_score / (1 - self.base_score))
+            p = 1.0 / (1.0 + np.exp(-(self.margins(X)[:, 0] + base)))
+            return np.column_stack([1 - p, p]).astype(np.float32)
+        # A constant base margin cancels out of the softmax
+        margins = self.margins(X)
+        margins -= margins.max(axis=1, keepdims=True)
+        exp = np.exp(margins)
+        return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while frontier:
+        frontier = [c for n in frontier for c in (left[n], right[n]) if c != -1]
+        if frontier:
+            depth += 1
+    return depth
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model):
+        try:
+            import onnxruntime
+            from onnxmltools import convert_xgboost
+            from onnxmltools.convert.common.data_types import FloatTensorType
+            from xgboost import XGBClassifier
+        except ImportError:
+            raise ImportError("The onnx backend needs onnxmltools and onnxruntime")
+
+        if not isinstance(model, XGBClassifier):
+            # onnxmltools converts sklearn wrappers; rebuild one around the booster
+            booster = model.get_booster()
+            learner = booster_json(booster)["learner"]
+            model = XGBClassifier(objective=learner["objective"]["name"],
+                                  n_estimators=booster.num_boosted_rounds())
+            model._Booster = booster
+            model.n_classes_ = int(learner["learner_model_param"]["num_class"])
+        n_features = model.get_booster().num_features()
+        onnx_model = convert_xgboost(model, initial_types=[("input", FloatTensorType([None, n_features]))])
+
+        options = onnxruntime.SessionOptions()
+        options.log_severity_level = 3
+        options.intra_op_num_threads = int(os.environ.get("CROP_ONNX_THREADS", "0"))
+        self.session = onnxruntime.InferenceSession(onnx_model.SerializeToString(), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[1].name
+
+    def predict_proba(self, X):
+        return self.session.run([self.output_name], {self.input_name: np.asarray(X, dtype=np.float32)})[0]
+
+
+BACKENDS = {cls.name: cls for cls in (SklearnBackend, BoosterBackend, NumpyTreeBackend, OnnxBackend)}
+
+
+def build_backends(model, names=None):
+    """Instantiate every backend that works here; returns (backends, errors)."""
+    backends, errors = {}, {}
+    for name in names or BACKENDS:
+        try:
+            backends[name] = BACKENDS[name](model)
+        except Exception as e:
+            errors[name] = str(e)
+    return backends, errors
+
+
+def _best_time(fn, X, repeat, budget):
+    # Stops early once the time budget is spent, so a backend that is far
+    # too slow for this batch size does not stall the benchmark
+    times = []
+    spent = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - start)
+        spent += times[-1]
+        if spent > budget:
+            break
+    return min(times)
+
+
+def benchmark_backends(backends, n_features, batch_size, repeat=20, budget=0.1, screen=False, seed=0):
+    """Time each backend on one batch; returns {name: result dict}.
+
+    Rows are drawn from a standard normal, i.e. from the scaled feature
+    space the model sees. The booster backend is the reference for the
+    equality check on the first 64 rows, which doubles as the warm-up call.
+    With screen=True, a backend more than SCREEN_FACTOR times slower than
+    the best on those 64 rows is not timed on the full batch.
+    """
+    X = np.random.default_rng(seed).standard_normal((batch_size, n_features)).astype(np.float32)
+    check = X[:64]
+    reference_name = "booster" if "booster" in backends else next(iter(backends))
+    reference = backends[reference_name].predict_proba(check)
+
+    results = {}
+    best_check = float("inf")
+    # Reference first, so the screen has a realistic time to compare against
+    for name in sorted(backends, key=lambda name: name != reference_name):
+        backend = backends[name]
+        try:
+            max_diff = float(np.max(np.abs(backend.predict_proba(check) - reference)))
+            check_seconds = _best_time(backend.predict_proba, check, 1, budget)
+            if screen and check_seconds > SCREEN_FACTOR * best_check:
+                results[name] = {"ok": False, "max_abs_diff": max_diff,
+                                 "error": f"screened out, {check_seconds / best_check:.1f}x slower on 64 rows"}
+                continue
+            best_check = min(best_check, check_seconds)
+            seconds = _best_time(backend.predict_proba, X, repeat, budget)
+        except Exception as e:
+            results[name] = {"ok": False, "error": str(e)}
+            continue
+        results[name] = {"ok": max_diff <= TOLERANCE, "max_abs_diff": max_diff,
+                         "seconds": seconds, "rows_per_second": batch_size / seconds}
+    return results
+
+
+def select_backend(backends, n_features, batch_size, repeat=20):
+    results = benchmark_backends(backends, n_features, batch_size, repeat, screen=True)
+    valid = {name: r for name, r in results.items() if r["ok"]}
+    if not valid:
+        raise RuntimeError(f"No inference backend matched the reference output: {results}")
+    best = min(valid, key=lambda name: valid[name]["seconds"])
+    return backends[best], results
+
+
+def bucket_for(batch_size):
+    for bucket in BATCH_BUCKETS:
+        if batch_size <= bucket:
+            return bucket
+    return BATCH_BUCKETS[-1]
+
+
+class _Selection:
+    def __init__(self, loaded):
+        self.n_features = len(loaded.features)
+        try:
+            self.fallback = BoosterBackend(loaded.model)
+        except Exception:
+            self.fallback = SklearnBackend(loaded.model)
+        self.backends, self.errors = {}, {}
+        self.chosen = {}
+        self.results = {}
+        self.ready = threading.Event()
+
+    def run(self, model):
+        try:
+            forced = os.environ.get(BACKEND_ENV, "auto")
+            self.backends, self.errors = build_backends(model, None if forced == "auto" else [forced])
+            if not self.backends:
+                raise RuntimeError(f"No inference backend available: {self.errors}")
+            for bucket in BATCH_BUCKETS:
+                if len(self.backends) == 1:
+                    backend = next(iter(self.backends.values()))
+                else:
+                    backend, self.results[bucket] = select_backend(self.backends, self.n_features, bucket)
+                # Published bucket by bucket; readers see a finished choice or none
+                self.chosen[bucket] = backend
+        except Exception as e:
+            # Keep serving with the fallback
+            self.errors["selection"] = str(e)
+        finally:
+            self.ready.set()
+
+
+# Keyed by the model_store.LoadedModel snapshot, so a reload re-benchmarks
+_selections = weakref.WeakKeyDictionary()
+_selections_lock = threading.Lock()
+
+
+def warm_up(loaded, wait=False):
+    """Start selecting the backends for loaded in the background, once.
+
+    With wait=True, block until every bucket has its backend.
+    """
+    with _selections_lock:
+        selection = _selections.get(loaded)
+        if selection is None:
+            selection = _selections[loaded] = _Selection(loaded)
+            threading.Thread(target=selection.run, args=(loaded.model,), daemon=True,
+                             name="backend-warmup").start()
+    if wait:
+        selection.ready.wait()
+    return selection
+
+
+def backend_for(loaded, batch_size):
+    selection = warm_up(loaded)
+    return selection.chosen.get(bucket_for(batch_size), selection.fallback)
+
+
+def describe(loaded):
+    selection = warm_up(loaded)
+    return {
+        "ready": selection.ready.is_set(),
+        "fallback": selection.fallback.name,
+        "available": sorted(selection.backends),
+        "unavailable": selection.errors,
+        "chosen": {bucket: backend.name for bucket, backend in sorted(selection.chosen.items())},
+        "benchmarks": selection.results,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from model_store import get_model_holder
+
+    parser = argparse.ArgumentParser(description="Benchmark the crop model inference backends")
+    parser.add_argument("--model", help="artifact directory or pickle, defaults to the app's model")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(BATCH_BUCKETS))
+    args = parser.parse_args()
+
+    loaded = get_model_holder(args.model).get()
+    backends, errors = build_backends(loaded.model)
+    for name, error in errors.items():
+        print(f"{name:8s} unavailable: {error}")
+    for batch_size in args.batch_sizes:
+        print(f"\nbatch size {batch_size}")
+        for name, r in benchmark_backends(backends, len(loaded.features), batch_size).items():
+            if "seconds" in r:
+                print(f"  {name:8s} {r['seconds'] * 1000:9.3f} ms  {r['rows_per_second']:12,.0f} rows/s  "
+                      f"max diff {r['max_abs_diff']:.1e}{'' if r['ok'] else '  MISMATCH'}")
+            else:
+                print(f"  {name:8s} failed: {r['error']}")
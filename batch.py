@@ -0,0 +1,121 @@
+"""Batch crop recommendation for files of soil-test rows.
+
+Rows are read in chunks so large district files never sit in memory twice,
+and each chunk goes through a single scaler.transform / predict_proba call.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from recommend import encode_soil_type, predict_proba, top_k
+
+
+CHUNK_SIZE = 10_000
+
+
+def file_format(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported file type '{ext}', expected .csv or .parquet")
+
+
+def read_chunks(source, features, fmt="csv", chunksize=CHUNK_SIZE):
+    """Yield DataFrames of at most chunksize rows with only the model features.
+
+    source may be a path or a file-like object such as a Streamlit upload.
+    """
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files needs pyarrow (pip install pyarrow)")
+        parquet_file = pq.ParquetFile(source)
+        missing = [name for name in features if name not in parquet_file.schema_arrow.names]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        for record_batch in parquet_file.iter_batches(batch_size=chunksize, columns=features):
+            yield record_batch.to_pandas()
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+        missing = [name for name in features if name not in header]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        if hasattr(source, "seek"):
+            source.seek(0)
+        yield from pd.read_csv(source, usecols=features, chunksize=chunksize)
+
+
+def score_chunk(loaded, chunk, k=3):
+    features = loaded.features
+    chunk = chunk[features].copy()
+    if "soil_type" in chunk and chunk["soil_type"].dtype == object:
+        chunk["soil_type"] = encode_soil_type(chunk["soil_type"])
+
+    indices, probs = top_k(predict_proba(loaded, chunk.to_numpy(dtype=np.float64)), k)
+    crops = loaded.le.classes_[indices]
+    for rank in range(indices.shape[1]):
+        chunk[f"crop_{rank + 1}"] = crops[:, rank]
+        chunk[f"probability_{rank + 1}"] = probs[:, rank]
+    return chunk
+
+
+def score_chunks(loaded, chunks, k=3, progress=None):
+    """Score an iterable of chunks; return (scored DataFrame, stats dict)."""
+    scored = []
+    rows = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        scored.append(score_chunk(loaded, chunk, k))
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+    seconds = time.perf_counter() - start
+
+    result = pd.concat(scored, ignore_index=True) if scored else pd.DataFrame()
+    stats = {
+        "rows": rows,
+        "chunks": len(scored),
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else float("inf"),
+    }
+    return result, stats
+
+
+def score_file(loaded, source, name=None, k=3, chunksize=CHUNK_SIZE, progress=None):
+    fmt = file_format(name or getattr(source, "name", source))
+    chunks = read_chunks(source, loaded.features, fmt=fmt, chunksize=chunksize)
+    return score_chunks(loaded, chunks, k=k, progress=progress)
+
+
+def write_scored(result, path):
+    if file_format(path) == "parquet":
+        result.to_parquet(path, index=False)
+    else:
+        result.to_csv(path, index=False)
+
+
+if __name__ == "__main__":
+    from model_store import get_model_holder
+
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of fields with the crop model")
+    parser.add_argument("input", help="file with the model's feature columns")
+    parser.add_argument("-o", "--output", help="where to write the scored file (.csv or .parquet)")
+    parser.add_argument("-k", "--top", type=int, default=3, help="number of crops per row")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--model", help="artifact directory or pickle, defaults to the full model")
+    args = parser.parse_args()
+
+    # Batch jobs are not latency-bound, so they keep the full model even
+    # where the app serves the compact one
+    loaded = get_model_holder(args.model, variant="full").get()
+    result, stats = score_file(loaded, args.input, k=args.top, chunksize=args.chunksize)
+    output = args.output or os.path.splitext(args.input)[0] + "_scored.csv"
+    write_scored(result, output)
+    print(f"Scored {stats['rows']} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s) -> {output}")
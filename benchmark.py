@@ -0,0 +1,249 @@
+"""Benchmarks for the app's hot paths, compared against a stored baseline.
+
+Nothing here touches the network: the app pages run headless through
+Streamlit's AppTest with requests' Session.request patched to fail, so
+the Demand Analysis page takes its offline fallback.
+
+    model_load_pickle     load crop_prediction_model.pkl
+    model_load_artifact   load the crop_model/ artifact
+    predict_single        predict_proba + top-3 for one row
+    predict_batch         predict_proba + top-3 for --batch-rows rows
+    trend_data            generate_trend_data for one crop (36 months)
+    price_matrix          simulate_prices for all 17 crops (36 months)
+    forecast              fit the seasonal model to all 17 crops, forecast 6 months
+    profit_summary        the Demand Analysis profit/strategy calculation
+    strategy_optimizer    every strategy over the premium and price grid, ranked
+    risk_simulation       100,000 Monte Carlo profit samples with their risk summary
+    page_<name>           one headless run of each app.py page
+    import_<name>         cold-start import time of each page (importtime.py);
+                          reported only, test_importtime.py guards the imports
+
+    python benchmark.py                          # run, write benchmark_results.json
+    python benchmark.py --baseline benchmark_baseline.json   # exit 1 on a regression
+    python benchmark.py --save-baseline          # record the current machine's numbers
+
+A case regresses when its median is more than --threshold times the
+baseline median and also slower by more than --min-delta-ms, so
+sub-millisecond jitter is not reported. Absolute timings only compare
+on like hardware: against a baseline from another Python, architecture
+or CPU count the ratios are printed with a warning and never fail.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+from artifacts import ARTIFACT_DIR, is_artifact
+from backends import warm_up
+from forecasting import SeasonalTrendModel
+from market import MARKET_CROPS, generate_trend_data, profit_summary, simulate_prices
+from model_store import PICKLE_PATH, LoadedModel, load_model_file
+from recommend import build_input, feature_defaults, recommend
+from risk import monthly_volatility, simulate_profit
+from strategy import optimize
+
+
+RESULTS_PATH = "benchmark_results.json"
+BASELINE_PATH = "benchmark_baseline.json"
+PAGES = ["Home", "Crop Recommendation", "Demand Analysis", "Crop Monitoring", "agribot"]
+
+
+def timed(func, repeat, warmup=1):
+    """Median and min wall time of func() in milliseconds."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"median_ms": float(np.median(times) * 1e3), "min_ms": float(np.min(times) * 1e3), "repeat": repeat}
+
+
+def _loaded(path):
+    model, le, scaler, manifest = load_model_file(path)
+    return LoadedModel(model, le, scaler, path, "bench", os.path.getmtime(path), 0.0, manifest)
+
+
+def model_cases(repeat, batch_rows):
+    cases = {}
+    if os.path.exists(PICKLE_PATH):
+        cases["model_load_pickle"] = timed(lambda: load_model_file(PICKLE_PATH), repeat)
+    if is_artifact(ARTIFACT_DIR):
+        cases["model_load_artifact"] = timed(lambda: load_model_file(ARTIFACT_DIR), repeat)
+
+    loaded = _loaded(ARTIFACT_DIR if is_artifact(ARTIFACT_DIR) else PICKLE_PATH)
+    # Time the selected backends, not the fallback served during warm-up
+    warm_up(loaded, wait=True)
+    defaults = feature_defaults(loaded)
+    row = build_input(defaults, loaded.features)
+    rng = np.random.default_rng(0)
+    # Rows around the training means, the scale the app's inputs come in
+    batch = row * rng.uniform(0.5, 1.5, (batch_rows, row.shape[1]))
+    # recommend() goes straight to the model, not through the app's LRU cache
+    cases["predict_single"] = timed(lambda: recommend(loaded, row, k=3), repeat * 20)
+    cases["predict_batch"] = timed(lambda: recommend(loaded, batch, k=3), repeat)
+    cases["predict_batch"]["rows"] = batch_rows
+    return cases
+
+
+def market_cases(repeat):
+    history = simulate_prices(MARKET_CROPS)
+    volatility = monthly_volatility(history[0])
+    return {
+        "trend_data": timed(lambda: generate_trend_data("Wheat"), repeat * 20),
+        "price_matrix": timed(lambda: simulate_prices(MARKET_CROPS), repeat * 20),
+        "forecast": timed(lambda: SeasonalTrendModel.fit(history).forecast(6), repeat * 20),
+        "profit_summary": timed(lambda: profit_summary(2500, 4.0, 5, 10500, quality_premium=10, organic_premium=20,
+                                                      storage_option="Short-term Storage (1-3 months)",
+                                                      processing_option="Basic Processing"), repeat * 20),
+        "strategy_optimizer": timed(lambda: optimize(2500, 4.0, 5, 14500, quality_premium=10,
+                                                     organic_premium=20).ranked(), repeat * 20),
+        # No time budget, so every run draws the full 100,000 samples
+        "risk_simulation": timed(lambda: simulate_profit(np.random.default_rng(0), 2500, 3.0, 4.0, 5,
+                                                         [2500, 3500, 5000, 1500, 2000], volatility,
+                                                         quality_premium=10,
+                                                         storage_option="Short-term Storage (1-3 months)",
+                                                         samples=100_000, time_budget=float("inf")).summary(), repeat),
+    }
+
+
+def _offline(*args, **kwargs):
+    import requests
+    raise requests.ConnectionError("network disabled for benchmarks")
+
+
+def page_cases(repeat):
+    """One headless run per page; empty when this Streamlit has no AppTest."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("Skipping page benchmarks: this Streamlit version has no AppTest")
+        return {}
+
+    def run_page(page):
+        at = AppTest.from_file("app.py", default_timeout=60)
+        at.run()
+        if page != "Home":
+            at.sidebar.radio[0].set_value(page)
+            at.run()
+        if at.exception:
+            raise RuntimeError(f"Page {page} failed: {at.exception[0].message}")
+
+    cases = {}
+    # Session.request is under both requests.get and the pooled price session
+    with mock.patch("requests.Session.request", _offline):
+        for page in PAGES:
+            cases["page_" + page.lower().replace(" ", "_")] = timed(lambda: run_page(page), repeat)
+    return cases
+
+
+def import_cases(repeat):
+    """Cold-start import time per page, each in a fresh interpreter."""
+    try:
+        from streamlit.testing.v1 import AppTest  # noqa: F401
+    except ImportError:
+        return {}
+    import importtime
+
+    cases = {}
+    for page, r in importtime.measure(repeat=repeat).items():
+        cases["import_" + page.lower().replace(" ", "_")] = {key: r[key]
+                                                             for key in ("median_ms", "min_ms", "repeat", "modules")}
+    return cases
+
+
+def run(repeat=5, batch_rows=1000, pages=True):
+    cases = {}
+    cases.update(model_cases(repeat, batch_rows))
+    cases.update(market_cases(repeat))
+    if pages:
+        cases.update(page_cases(max(1, repeat // 2)))
+        cases.update(import_cases(max(1, repeat // 2)))
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "cases": cases,
+    }
+
+
+FINGERPRINT = ("python", "machine", "cpus")
+
+
+def fingerprint(results):
+    return ", ".join(f"{key} {results.get(key)}" for key in FINGERPRINT)
+
+
+def same_machine(results, baseline):
+    return all(results.get(key) == baseline.get(key) for key in FINGERPRINT)
+
+
+def compare(results, baseline, threshold=1.5, min_delta_ms=1.0):
+    """Rows of (case, baseline ms, current ms, ratio, regressed) for cases in both."""
+    rows = []
+    for name, current in results["cases"].items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            continue
+        ratio = current["median_ms"] / before["median_ms"] if before["median_ms"] > 0 else float("inf")
+        regressed = (not name.startswith("import_") and ratio > threshold
+                     and current["median_ms"] - before["median_ms"] > min_delta_ms)
+        rows.append((name, before["median_ms"], current["median_ms"], ratio, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the app's hot paths and compare against a baseline")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    parser.add_argument("--no-pages", action="store_true", help="skip the headless page runs and import timing")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write the results to {BASELINE_PATH}")
+    parser.add_argument("--threshold", type=float, default=1.5, help="median slowdown that counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.batch_rows, pages=not args.no_pages)
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(results, file, indent=2)
+
+    print(f"{'case':<28}{'median ms':>11}{'min ms':>10}")
+    for name, r in results["cases"].items():
+        print(f"{name:<28}{r['median_ms']:>11.3f}{r['min_ms']:>10.3f}")
+    print(f"\nResults written to {args.out}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    rows = compare(results, baseline, args.threshold, args.min_delta_ms)
+    print(f"\nAgainst {args.baseline} ({baseline['created_at']}):")
+    comparable = same_machine(results, baseline)
+    if not comparable:
+        print(f"Warning: baseline machine ({fingerprint(baseline)}) differs from this one ({fingerprint(results)}); "
+              f"ratios are reported only, re-record the baseline here with --save-baseline")
+    print(f"{'case':<28}{'baseline':>10}{'current':>10}{'ratio':>8}")
+    for name, before, current, ratio, regressed in rows:
+        print(f"{name:<28}{before:>10.3f}{current:>10.3f}{ratio:>7.2f}x" + ("  REGRESSION" if regressed else ""))
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1 if comparable else 0
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
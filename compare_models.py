@@ -0,0 +1,172 @@
+"""Compare candidate classifiers on accuracy and on what they cost to run.
+
+Every (model, fold) fit runs in a process pool over the same stratified
+folds, so all models see identical splits. Each model is scaled inside
+its own pipeline, so no fold leaks into the scaler. After cross-validation
+the fold-0 model of each candidate is timed in this process, one at a
+time: single-row p50/p99 latency, batch throughput and pickled size.
+
+    python compare_models.py --out model_comparison.json
+    python compare_models.py --models xgboost random_forest --folds 3
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+
+def _xgboost():
+    from xgboost import XGBClassifier
+    return XGBClassifier(tree_method='hist', n_estimators=200, learning_rate=0.1, max_depth=6, n_jobs=1)
+
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=200, n_jobs=1, random_state=42)
+
+
+def _extra_trees():
+    from sklearn.ensemble import ExtraTreesClassifier
+    return ExtraTreesClassifier(n_estimators=200, n_jobs=1, random_state=42)
+
+
+def _hist_gradient_boosting():
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(max_iter=200, random_state=42)
+
+
+def _logistic_regression():
+    from sklearn.linear_model import LogisticRegression
+    return LogisticRegression(max_iter=2000)
+
+
+def _knn():
+    from sklearn.neighbors import KNeighborsClassifier
+    return KNeighborsClassifier(n_neighbors=5)
+
+
+# Factories are module-level functions so they pickle into the worker processes
+CANDIDATES = {
+    "xgboost": _xgboost,
+    "random_forest": _random_forest,
+    "extra_trees": _extra_trees,
+    "hist_gradient_boosting": _hist_gradient_boosting,
+    "logistic_regression": _logistic_regression,
+    "knn": _knn,
+}
+
+
+def make_pipeline(name):
+    from sklearn.pipeline import make_pipeline as sk_make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    return sk_make_pipeline(StandardScaler(), CANDIDATES[name]())
+
+
+def fit_fold(name, fold, X, y, train_idx, test_idx, keep_model=False):
+    """One cross-validation fit, run in a worker process."""
+    model = make_pipeline(name)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    accuracy = float((model.predict(X[test_idx]) == y[test_idx]).mean())
+    # The fold-0 model goes back pickled; its bytes are also the size measure
+    return {"model": name, "fold": fold, "accuracy": accuracy, "fit_seconds": fit_seconds,
+            "pickle": pickle.dumps(model) if keep_model else None}
+
+
+def measure_serving(model, X, latency_rows=300, batch_rows=10_000):
+    """Single-row latency percentiles (us) and batch throughput (rows/s)."""
+    rows = X[:latency_rows]
+    model.predict_proba(rows[:1])
+    times = []
+    for i in range(len(rows)):
+        start = time.perf_counter()
+        model.predict_proba(rows[i:i + 1])
+        times.append(time.perf_counter() - start)
+    batch = np.resize(X, (batch_rows, X.shape[1]))
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    batch_seconds = time.perf_counter() - start
+    return {"latency_p50_us": float(np.percentile(times, 50) * 1e6),
+            "latency_p99_us": float(np.percentile(times, 99) * 1e6),
+            "throughput_rows_per_s": float(batch_rows / batch_seconds)}
+
+
+def compare(X, y, models=None, folds=5, seed=42, workers=None):
+    from sklearn.model_selection import StratifiedKFold
+
+    models = list(models or CANDIDATES)
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, y))
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_fold, name, fold, X, y, train_idx, test_idx, fold == 0)
+                   for name in models for fold, (train_idx, test_idx) in enumerate(splits)]
+        fold_results = [future.result() for future in futures]
+    cv_seconds = time.perf_counter() - start
+
+    results = {}
+    for name in models:
+        runs = sorted((r for r in fold_results if r["model"] == name), key=lambda r: r["fold"])
+        accuracies = [r["accuracy"] for r in runs]
+        blob = runs[0]["pickle"]
+        # Timed here, one model at a time, so the pool does not skew latency
+        serving = measure_serving(pickle.loads(blob), X[splits[0][1]])
+        results[name] = {
+            "accuracy_mean": float(np.mean(accuracies)),
+            "accuracy_std": float(np.std(accuracies)),
+            "fold_accuracy": accuracies,
+            "fit_seconds_mean": float(np.mean([r["fit_seconds"] for r in runs])),
+            "size_kb": len(blob) / 1024,
+            **serving,
+        }
+    return results, cv_seconds
+
+
+def main(argv=None):
+    from sklearn.preprocessing import LabelEncoder
+
+    from artifacts import DEFAULT_FEATURES
+    from dataset import DATASET_PATH, load_dataset
+
+    parser = argparse.ArgumentParser(description="Cross-validate candidate classifiers and report their costs")
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--models", nargs="+", choices=list(CANDIDATES), default=list(CANDIDATES))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="model_comparison.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    df = load_dataset(args.data, columns=DEFAULT_FEATURES + ['label'])
+    X = df[DEFAULT_FEATURES].to_numpy(dtype=np.float64)
+    y = LabelEncoder().fit_transform(df['label'].astype(str))
+
+    results, cv_seconds = compare(X, y, args.models, args.folds, args.seed, args.workers)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": os.path.basename(args.data),
+        "features": DEFAULT_FEATURES,
+        "folds": args.folds,
+        "seed": args.seed,
+        "cv_seconds": cv_seconds,
+        "models": results,
+    }
+    with open(args.out, "w") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'model':<24}{'accuracy':>10}{'fit s':>8}{'p50 us':>9}{'p99 us':>9}{'rows/s':>11}{'KB':>8}")
+    for name, r in sorted(results.items(), key=lambda item: -item[1]["accuracy_mean"]):
+        print(f"{name:<24}{r['accuracy_mean']:>10.4f}{r['fit_seconds_mean']:>8.2f}{r['latency_p50_us']:>9.0f}"
+              f"{r['latency_p99_us']:>9.0f}{r['throughput_rows_per_s']:>11,.0f}{r['size_kb']:>8.0f}")
+    print(f"\nCross-validation took {cv_seconds:.1f}s; report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
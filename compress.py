@@ -0,0 +1,235 @@
+"""Compact variant of the crop model for low-latency serving.
+
+Starting from the full artifact, three steps are tried:
+
+1. truncate  keep the fewest boosting rounds whose validation accuracy is
+             within tolerance of the full model (early stopping after the
+             fact, on a model that was trained without it)
+2. prune     collapse the lowest-gain trees into single leaves that hold
+             the tree's hessian-weighted mean output, as long as accuracy
+             stays within tolerance
+3. distill   (--distill) fit a shallower booster on the training rows and
+             jittered copies of them, labelled by the full model
+
+Each variant is scored on the test rows of model.py's split for accuracy,
+single-row latency and size. The fastest variant within tolerance is
+written to ``crop_model_compact/``. The app serves it when
+CROP_MODEL_VARIANT=compact; batch jobs keep using the full model.
+
+    python compress.py --distill
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from artifacts import ARTIFACT_DIR, COMPACT_DIR, BoosterClassifier, booster_bytes, load_artifact, save_artifact
+from dataset import DATASET_PATH, load_dataset
+from feature_selection import row_latency_us
+
+
+def booster_from_json(model_json):
+    import xgboost as xgb
+
+    return xgb.Booster(model_file=bytearray(json.dumps(model_json).encode()))
+
+
+def tree_gains(model_json):
+    """Total split gain of every tree, in tree order."""
+    trees = model_json["learner"]["gradient_booster"]["model"]["trees"]
+    gains = []
+    for tree in trees:
+        leaves = np.asarray(tree["left_children"]) == -1
+        gains.append(float(np.asarray(tree["loss_changes"])[~leaves].sum()))
+    return np.array(gains)
+
+
+def _leaf_tree(tree):
+    # One-leaf tree with the hessian-weighted mean of the original leaves,
+    # so the tree's average contribution to the margin is kept
+    left = np.asarray(tree["left_children"])
+    leaves = left == -1
+    values = np.asarray(tree["split_conditions"], dtype=np.float64)[leaves]
+    hessians = np.asarray(tree["sum_hessian"], dtype=np.float64)[leaves]
+    value = float(np.average(values, weights=hessians)) if hessians.sum() > 0 else float(values.mean())
+    collapsed = dict(tree)
+    collapsed.update({
+        "base_weights": [value], "default_left": [0], "left_children": [-1], "right_children": [-1],
+        "loss_changes": [0.0], "parents": [2147483647], "split_conditions": [value],
+        "split_indices": [0], "split_type": [0], "sum_hessian": [float(hessians.sum())],
+        "categories": [], "categories_nodes": [], "categories_segments": [], "categories_sizes": [],
+    })
+    collapsed["tree_param"] = dict(tree["tree_param"], num_nodes="1", num_deleted="0")
+    return collapsed
+
+
+def prune_trees(model_json, drop):
+    """A copy of model_json with the trees at indices drop collapsed to leaves."""
+    pruned = json.loads(json.dumps(model_json))
+    trees = pruned["learner"]["gradient_booster"]["model"]["trees"]
+    for i in drop:
+        trees[i] = _leaf_tree(trees[i])
+    return pruned
+
+
+def node_count(booster):
+    model_json = json.loads(booster.save_raw(raw_format="json"))
+    return sum(len(tree["left_children"]) for tree in model_json["learner"]["gradient_booster"]["model"]["trees"])
+
+
+def _accuracy(booster, X, y, iteration_range=(0, 0)):
+    proba = booster.inplace_predict(X.astype(np.float32), iteration_range=iteration_range)
+    return float((proba.argmax(axis=1) == y).mean())
+
+
+def _agreement(booster, reference, X, iteration_range=(0, 0)):
+    # Share of rows where the top crop matches the full model's; unlike
+    # validation accuracy this needs no labels, so it can use every
+    # training row and is not fooled by a small validation fold
+    top = booster.inplace_predict(X, iteration_range=iteration_range).argmax(axis=1)
+    return float((top == reference).mean())
+
+
+def _within_tolerance(booster, X_val, y_val, X_check, reference, target, tolerance, iteration_range=(0, 0)):
+    return (_accuracy(booster, X_val, y_val, iteration_range) >= target
+            and _agreement(booster, reference, X_check, iteration_range) >= 1 - tolerance)
+
+
+def check_rows(X_fit, X_val, copies=4, noise=0.1, seed=42):
+    """Rows to compare a variant against the full model on: the training
+    rows plus jittered copies, which probe the space between training
+    points where a cut-down model differs first."""
+    rng = np.random.default_rng(seed)
+    X = np.vstack([X_fit, X_val])
+    return np.vstack([X] + [X + rng.normal(0.0, noise, X.shape) for _ in range(copies)]).astype(np.float32)
+
+
+def truncate(booster, X_val, y_val, X_check, tolerance, step=5):
+    """Fewest rounds within tolerance of the full model."""
+    total = booster.num_boosted_rounds()
+    target = _accuracy(booster, X_val, y_val) - tolerance
+    reference = booster.inplace_predict(X_check).argmax(axis=1)
+    for rounds in range(step, total, step):
+        if _within_tolerance(booster, X_val, y_val, X_check, reference, target, tolerance, (0, rounds)):
+            return booster[:rounds]
+    return booster
+
+
+def prune(booster, full, X_val, y_val, X_check, tolerance, fractions=(0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7)):
+    """Collapse the largest share of low-gain trees that stays within tolerance of full."""
+    target = _accuracy(full, X_val, y_val) - tolerance
+    reference = full.inplace_predict(X_check).argmax(axis=1)
+    model_json = json.loads(booster.save_raw(raw_format="json"))
+    gains = tree_gains(model_json)
+    # Trees that are already single leaves have no gain and nothing to cut,
+    # so fractions are taken of the trees that still split
+    splitting = np.flatnonzero(gains > 0)
+    order = splitting[np.argsort(gains[splitting])]
+    best = booster
+    for fraction in fractions:
+        candidate = booster_from_json(prune_trees(model_json, order[:int(fraction * len(order))]))
+        if not _within_tolerance(candidate, X_val, y_val, X_check, reference, target, tolerance):
+            break
+        best = candidate
+    return best
+
+
+def distill(teacher, X_fit, y_fit, X_val, y_val, max_depth=3, copies=4, noise=0.1, seed=42):
+    """Shallower booster trained on the real rows plus jittered copies
+    labelled by the teacher."""
+    from xgboost import XGBClassifier
+
+    rng = np.random.default_rng(seed)
+    X_jitter = np.vstack([X_fit + rng.normal(0.0, noise, X_fit.shape) for _ in range(copies)])
+    y_jitter = teacher.inplace_predict(X_jitter.astype(np.float32)).argmax(axis=1)
+    # The real rows keep their labels, so every class stays present
+    X_transfer, y_transfer = np.vstack([X_fit, X_jitter]), np.concatenate([y_fit, y_jitter])
+    student = XGBClassifier(tree_method='hist', n_estimators=500, max_depth=max_depth, learning_rate=0.2,
+                            early_stopping_rounds=20, eval_metric='mlogloss', random_state=seed)
+    student.fit(X_transfer, y_transfer, eval_set=[(X_val, y_val)], verbose=False)
+    return student.get_booster()[:student.best_iteration + 1]
+
+
+def describe_variant(name, booster, X_test, y_test):
+    return {
+        "variant": name,
+        "rounds": int(booster.num_boosted_rounds()),
+        "nodes": int(node_count(booster)),
+        "size_kb": len(booster_bytes(booster)) / 1024,
+        "accuracy": _accuracy(booster, X_test, y_test),
+        "latency_us": row_latency_us(booster, X_test),
+    }
+
+
+def evaluation_split(loaded_features, scaler, le, data, test_size=0.2, val_size=0.15, seed=42):
+    """(X_fit, y_fit, X_val, y_val, X_test, y_test), scaled, with model.py's row split."""
+    from sklearn.model_selection import train_test_split
+
+    df = load_dataset(data, columns=list(loaded_features) + ['label'])
+    X = scaler.transform(df[loaded_features].to_numpy(dtype=np.float64))
+    y = le.transform(df['label'].astype(str))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=val_size, stratify=y_train,
+                                                  random_state=seed)
+    return X_fit, y_fit, X_val, y_val, X_test, y_test
+
+
+def compress(model_dir=ARTIFACT_DIR, out=COMPACT_DIR, data=None, tolerance=0.005, use_distill=False,
+             student_depth=3, seed=42):
+    model, le, scaler, manifest = load_artifact(model_dir)
+    data = data or (manifest.get("dataset") or {}).get("path") or DATASET_PATH
+    X_fit, y_fit, X_val, y_val, X_test, y_test = evaluation_split(manifest["features"], scaler, le, data, seed=seed)
+
+    full = model.get_booster()
+    X_check = check_rows(X_fit, X_val, seed=seed)
+    variants = {"full": full}
+    start = time.perf_counter()
+    variants["truncated"] = truncate(full, X_val, y_val, X_check, tolerance)
+    variants["pruned"] = prune(variants["truncated"], full, X_val, y_val, X_check, tolerance)
+    if use_distill:
+        variants["distilled"] = distill(full, X_fit, y_fit, X_val, y_val, max_depth=student_depth, seed=seed)
+    seconds = time.perf_counter() - start
+
+    report = [describe_variant(name, booster, X_test, y_test) for name, booster in variants.items()]
+    full_report = report[0]
+    # The full model itself stays a candidate, so a variant is only served
+    # when it is actually faster
+    eligible = [r for r in report if r["accuracy"] >= full_report["accuracy"] - tolerance]
+    chosen = min(eligible, key=lambda r: (r["latency_us"], r["size_kb"]))
+
+    booster = variants[chosen["variant"]]
+    metrics = {"accuracy": chosen["accuracy"], "boosting_rounds": chosen["rounds"]}
+    compact_manifest = save_artifact(out, BoosterClassifier(booster, manifest["n_classes"]), le, scaler,
+                                     features=manifest["features"], dataset_path=data, metrics=metrics,
+                                     extra={"compressed_from": manifest["version"],
+                                            "compression": {"variant": chosen["variant"], "tolerance": tolerance,
+                                                            "seconds": seconds, "variants": report}})
+    return chosen, report, compact_manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a compact variant of the crop model")
+    parser.add_argument("--model", default=ARTIFACT_DIR, help="full model artifact")
+    parser.add_argument("--out", default=COMPACT_DIR, help="where to write the compact artifact")
+    parser.add_argument("--data", default=None, help="dataset CSV (default: the one in the manifest)")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="test accuracy the compact model may lose")
+    parser.add_argument("--distill", action="store_true", help="also try a shallower distilled model")
+    parser.add_argument("--student-depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    chosen, report, manifest = compress(args.model, args.out, args.data, args.tolerance, args.distill,
+                                        args.student_depth, args.seed)
+    full = report[0]
+    print(f"{'variant':<11}{'rounds':>7}{'nodes':>8}{'size KB':>9}{'accuracy':>10}{'us/row':>8}")
+    for r in report:
+        print(f"{r['variant']:<11}{r['rounds']:>7}{r['nodes']:>8}{r['size_kb']:>9.0f}{r['accuracy']:>10.4f}"
+              f"{r['latency_us']:>8.0f}")
+    print(f"\nServing variant '{chosen['variant']}': accuracy {chosen['accuracy'] - full['accuracy']:+.4f}, "
+          f"{full['latency_us'] / chosen['latency_us']:.1f}x faster, "
+          f"{full['size_kb'] / chosen['size_kb']:.1f}x smaller -> '{args.out}' (version {manifest['version']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Typed loading of the crop dataset with a columnar cache.
+
+The CSV is parsed once with an explicit schema (float32 measurements, small
+integer codes for the categorical columns) and written to an uncompressed
+Feather file under ``.cache/datasets``. Later loads memory-map that file
+and read only the requested columns. The cache entry is keyed by the CSV's
+path, size and modification time, so an edited CSV is parsed again.
+
+Without pyarrow, loads fall back to a typed, column-projected read_csv.
+
+    python dataset.py --bench             # compare load time and peak RSS
+    python dataset.py --bench --scale 100 # on a 100x larger copy
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+DATASET_PATH = "Crop_recommendationV2 (1).csv"
+CACHE_DIR = os.environ.get("CROP_CACHE_DIR", ".cache")
+CACHE_FORMATS = ("feather", "parquet")
+
+# Column dtypes of Crop_recommendationV2. Measurements fit float32; the
+# integer columns are small counts or category codes.
+SCHEMA = {
+    "N": "int16",
+    "P": "int16",
+    "K": "int16",
+    "temperature": "float32",
+    "humidity": "float32",
+    "ph": "float32",
+    "rainfall": "float32",
+    "label": "category",
+    "soil_moisture": "float32",
+    "soil_type": "int8",
+    "sunlight_exposure": "float32",
+    "wind_speed": "float32",
+    "co2_concentration": "float32",
+    "organic_matter": "float32",
+    "irrigation_frequency": "int8",
+    "crop_density": "float32",
+    "pest_pressure": "float32",
+    "fertilizer_usage": "float32",
+    "growth_stage": "int8",
+    "urban_area_proximity": "float32",
+    "water_source_type": "int8",
+    "frost_risk": "float32",
+    "water_usage_efficiency": "float32",
+}
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_csv_typed(path, columns=None):
+    """read_csv with the schema dtypes and only the requested columns."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = list(header) if columns is None else list(columns)
+    missing = [name for name in usecols if name not in header]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    dtype = {name: SCHEMA[name] for name in usecols if name in SCHEMA}
+    return pd.read_csv(path, usecols=usecols, dtype=dtype)[usecols]
+
+
+def cache_path(path, cache_dir=CACHE_DIR, fmt="feather"):
+    stat = os.stat(path)
+    stamp = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    digest = hashlib.sha256(stamp.encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, "datasets", f"{stem}-{digest}.{fmt}")
+
+
+def build_cache(path, cache_dir=CACHE_DIR, fmt="feather"):
+    """Parse the whole CSV once and write it in a columnar format."""
+    import pyarrow as pa
+
+    target = cache_path(path, cache_dir, fmt)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    table = pa.Table.from_pandas(read_csv_typed(path), preserve_index=False)
+    tmp = target + ".tmp"
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        # Uncompressed, so loads can memory-map the file instead of decoding it
+        feather.write_feather(table, tmp, compression="uncompressed")
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def read_cache(target, columns=None):
+    if target.endswith(".feather"):
+        import pyarrow.feather as feather
+        table = feather.read_table(target, columns=columns, memory_map=True)
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(target, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_dataset(path=DATASET_PATH, columns=None, cache=True, cache_dir=CACHE_DIR, fmt="feather"):
+    """The dataset as a DataFrame with schema dtypes, limited to columns.
+
+    Uses (and creates on first use) the columnar cache when pyarrow is
+    available and cache is true; otherwise parses the CSV.
+    """
+    if fmt not in CACHE_FORMATS:
+        raise ValueError(f"Unknown cache format '{fmt}', expected one of {CACHE_FORMATS}")
+    columns = list(columns) if columns is not None else None
+    if not path.lower().endswith(".csv") or not cache or not _has_pyarrow():
+        if path.lower().endswith((".parquet", ".pq", ".feather")):
+            return read_cache(path, columns)
+        return read_csv_typed(path, columns)
+
+    target = cache_path(path, cache_dir, fmt)
+    if not os.path.exists(target):
+        try:
+            target = build_cache(path, cache_dir, fmt)
+        except OSError:
+            # Read-only checkout: parse the CSV every time
+            return read_csv_typed(path, columns)
+    df = read_cache(target, columns)
+    missing = [name for name in columns or [] if name not in df.columns]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+    return df
+
+
+def load_xy(path=DATASET_PATH, features=None, **kwargs):
+    """(X float64 matrix, label Series) for the given feature columns."""
+    from artifacts import DEFAULT_FEATURES
+
+    features = list(features or DEFAULT_FEATURES)
+    df = load_dataset(path, columns=features + ["label"], **kwargs)
+    return df[features].to_numpy(dtype=np.float64), df["label"].astype(str)
+
+
+def peak_rss_mb():
+    # VmHWM starts afresh with each exec; ru_maxrss is inherited from the parent
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Each benchmark runs in a fresh interpreter so peak RSS is its own
+_BENCH_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+import pandas as pd, pyarrow.feather, pyarrow.parquet
+import dataset
+path, method, columns = {path!r}, {method!r}, {columns!r}
+baseline = dataset.peak_rss_mb()
+start = time.perf_counter()
+if method == "csv":
+    df = pd.read_csv(path)
+elif method == "csv-typed":
+    df = dataset.read_csv_typed(path, columns)
+else:
+    df = dataset.load_dataset(path, columns=columns, fmt=method, cache_dir={cache_dir!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "peak_rss_mb": dataset.peak_rss_mb() - baseline, "rows": len(df),
+                  "memory_mb": df.memory_usage(deep=True).sum() / 2**20}}))
+"""
+
+
+def scaled_copy(path, scale, cache_dir=CACHE_DIR):
+    """A CSV with the rows of path repeated scale times, for benchmarks."""
+    target = os.path.join(cache_dir, "datasets", f"bench-x{scale}.csv")
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        df = pd.read_csv(path)
+        pd.concat([df] * scale, ignore_index=True).to_csv(target, index=False)
+    return target
+
+
+def benchmark(path=DATASET_PATH, columns=None, cache_dir=CACHE_DIR):
+    from artifacts import DEFAULT_FEATURES
+
+    columns = list(columns or DEFAULT_FEATURES) + ["label"]
+    repo = os.path.dirname(os.path.abspath(__file__))
+    for fmt in CACHE_FORMATS:
+        target = cache_path(path, cache_dir, fmt)
+        if not os.path.exists(target):
+            build_cache(path, cache_dir, fmt)
+
+    results = {}
+    for method in ("csv", "csv-typed") + CACHE_FORMATS:
+        script = _BENCH_SCRIPT.format(repo=repo, path=path, method=method, columns=columns,
+                                      cache_dir=cache_dir)
+        results[method] = json.loads(subprocess.check_output([sys.executable, "-c", script]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or benchmark the columnar dataset cache")
+    parser.add_argument("path", nargs="?", default=DATASET_PATH)
+    parser.add_argument("--bench", action="store_true", help="compare load time and peak RSS")
+    parser.add_argument("--scale", type=int, default=1, help="benchmark on a copy with rows repeated")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    if not args.bench:
+        for fmt in CACHE_FORMATS:
+            print(f"Wrote {build_cache(args.path, args.cache_dir, fmt)}")
+        return
+
+    path = scaled_copy(args.path, args.scale, args.cache_dir) if args.scale > 1 else args.path
+    print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB; peak RSS is the growth over the imports")
+    print(f"{'method':<12}{'rows':>10}{'seconds':>10}{'peak RSS MB':>13}{'frame MB':>10}")
+    for method, result in benchmark(path, cache_dir=args.cache_dir).items():
+        print(f"{method:<12}{result['rows']:>10}{result['seconds']:>10.3f}"
+              f"{result['peak_rss_mb']:>13.0f}{result['memory_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Feature selection that weighs accuracy against serving cost.
+
+Candidate feature subsets are scored on held-out rows by accuracy and by
+what they cost to serve: single-row prediction latency, booster size and
+the number of inputs a farmer has to provide. The subsets are the
+prefixes of a gain ranking from one fit on every candidate, plus the
+default 10-feature set. Only the Pareto-optimal subsets are kept, and
+choose() picks the cheapest one within a tolerance of the best accuracy.
+
+    python feature_selection.py                 # print the front
+    python model.py --select-features           # use it when training
+
+The test rows of model.py's split (same test_size and seed) are never
+seen here.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from artifacts import DEFAULT_FEATURES
+from dataset import DATASET_PATH, SCHEMA, load_dataset
+
+
+# Every numeric column of the dataset
+CANDIDATE_FEATURES = [name for name in SCHEMA if name != "label"]
+
+# Objectives of a scored subset: +1 is maximized, -1 minimized
+OBJECTIVES = {"accuracy": 1, "latency_us": -1, "size_kb": -1, "n_features": -1}
+
+
+def _fit(X_fit, y_fit, X_val, y_val, n_jobs, seed):
+    from xgboost import XGBClassifier
+
+    model = XGBClassifier(tree_method='hist', n_estimators=300, learning_rate=0.1, max_depth=6,
+                          early_stopping_rounds=20, eval_metric='mlogloss', n_jobs=n_jobs,
+                          random_state=seed)
+    model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+    return model.get_booster()[:model.best_iteration + 1]
+
+
+def row_latency_us(booster, X, repeat=200):
+    # Median single-row inplace_predict, the path the app and service use
+    # One thread: a single row gains nothing from more, and timings are steadier.
+    # Set on a copy so the caller's booster keeps its own settings.
+    booster = booster.copy()
+    booster.set_param({"nthread": 1})
+    rows = X[:repeat].astype(np.float32)
+    booster.inplace_predict(rows[:1])
+    medians = []
+    # Best of three passes, so a burst of background load does not decide
+    for _ in range(3):
+        times = []
+        for i in range(len(rows)):
+            start = time.perf_counter()
+            booster.inplace_predict(rows[i:i + 1])
+            times.append(time.perf_counter() - start)
+        medians.append(np.median(times))
+    return float(min(medians) * 1e6)
+
+
+def score_subset(features, columns, X_fit, y_fit, X_val, y_val, X_score, y_score, n_jobs=None, seed=42):
+    idx = [columns.index(name) for name in features]
+    booster = _fit(X_fit[:, idx], y_fit, X_val[:, idx], y_val, n_jobs, seed)
+    proba = booster.inplace_predict(X_score[:, idx].astype(np.float32))
+    return {
+        "features": list(features),
+        "n_features": len(features),
+        "accuracy": float((proba.argmax(axis=1) == y_score).mean()),
+        "latency_us": row_latency_us(booster, X_score[:, idx]),
+        "size_kb": len(booster.save_raw()) / 1024,
+        "rounds": int(booster.num_boosted_rounds()),
+    }
+
+
+def gain_ranking(columns, X_fit, y_fit, X_val, y_val, n_jobs=None, seed=42):
+    """Candidate columns, most total gain first."""
+    booster = _fit(X_fit, y_fit, X_val, y_val, n_jobs, seed)
+    gain = booster.get_score(importance_type="total_gain")
+    # Without feature names xgboost reports columns as f0, f1, ...
+    return sorted(columns, key=lambda name: -gain.get(f"f{columns.index(name)}", 0.0))
+
+
+def dominates(a, b):
+    better_or_equal = all(sign * a[key] >= sign * b[key] for key, sign in OBJECTIVES.items())
+    strictly_better = any(sign * a[key] > sign * b[key] for key, sign in OBJECTIVES.items())
+    return better_or_equal and strictly_better
+
+
+def pareto_front(points):
+    front = [p for p in points if not any(dominates(q, p) for q in points if q is not p)]
+    return sorted(front, key=lambda p: (p["n_features"], -p["accuracy"]))
+
+
+def choose(front, tolerance=0.005):
+    """Fewest features, then lowest latency, within tolerance of the best accuracy."""
+    best = max(p["accuracy"] for p in front)
+    eligible = [p for p in front if p["accuracy"] >= best - tolerance]
+    return min(eligible, key=lambda p: (p["n_features"], p["latency_us"], p["size_kb"]))
+
+
+def select_features(data=DATASET_PATH, candidates=None, test_size=0.2, val_size=0.15, score_size=0.15,
+                    tolerance=0.005, n_jobs=None, seed=42, progress=None):
+    """Score candidate subsets; returns (chosen point, Pareto front)."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder
+
+    columns = list(candidates or CANDIDATE_FEATURES)
+    df = load_dataset(data, columns=columns + ['label'])
+    X = df[columns].to_numpy(dtype=np.float64)
+    y = LabelEncoder().fit_transform(df['label'].astype(str))
+
+    # Same row split as model.py, so its test rows stay unseen
+    train_idx, _ = train_test_split(np.arange(len(y)), test_size=test_size, random_state=seed)
+    X, y = X[train_idx], y[train_idx]
+    X_rest, X_score, y_rest, y_score = train_test_split(X, y, test_size=score_size, stratify=y,
+                                                        random_state=seed)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_rest, y_rest, test_size=val_size, stratify=y_rest,
+                                                  random_state=seed)
+
+    ranking = gain_ranking(columns, X_fit, y_fit, X_val, y_val, n_jobs, seed)
+    subsets = [ranking[:k] for k in range(1, len(ranking) + 1)]
+    default = [name for name in DEFAULT_FEATURES if name in columns]
+    if default and sorted(default) not in [sorted(s) for s in subsets]:
+        subsets.append(default)
+
+    points = []
+    for features in subsets:
+        points.append(score_subset(features, columns, X_fit, y_fit, X_val, y_val, X_score, y_score,
+                                   n_jobs, seed))
+        if progress:
+            progress(points[-1])
+    front = pareto_front(points)
+    return choose(front, tolerance), front
+
+
+def format_point(point):
+    return (f"{point['n_features']:>3} features  accuracy {point['accuracy']:.4f}  "
+            f"{point['latency_us']:>6.0f} us/row  {point['size_kb']:>7.0f} KB  "
+            f"{', '.join(point['features'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pareto front of feature subsets")
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.005,
+                        help="accuracy given up for a cheaper subset")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    chosen, front = select_features(args.data, tolerance=args.tolerance, seed=args.seed)
+    print("Pareto front (accuracy vs latency, size and feature count):")
+    for point in front:
+        print(("* " if point is chosen else "  ") + format_point(point))
+
+
+if __name__ == "__main__":
+    main()
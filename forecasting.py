@@ -0,0 +1,97 @@
+"""Seasonal price forecasts with prediction intervals.
+
+Every crop's monthly history is fitted with the same model, a linear trend
+plus the first few harmonics of a 12-month season:
+
+    price(t) = a + b*t + sum_k (c_k sin(2 pi k t / 12) + d_k cos(2 pi k t / 12)) + noise
+
+All crops share the design matrix, so one least-squares solve fits every
+crop at once. The fit keeps the coefficients, the residual spread and
+(X'X)^-1, which is everything a forecast needs. Forecasts for any horizon
+are matrix products, and the prediction intervals are the exact ones of
+the regression: the residual variance plus the uncertainty of the fitted
+mean at each future month, with Student-t quantiles.
+
+fitted_model() fits once per process for a given crop list and history
+length, so reruns and sessions only pay for the matrix product.
+"""
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from market import price_matrix
+
+
+PERIOD = 12
+HARMONICS = 3
+
+
+def design_matrix(t, period=PERIOD, harmonics=HARMONICS):
+    t = np.asarray(t, dtype=np.float64)
+    columns = [np.ones_like(t), t]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * t / period
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+class SeasonalTrendModel:
+    """Trend plus seasonal harmonics, fitted to many series of one length."""
+
+    def __init__(self, coef, sigma, xtx_inv, n_obs, period=PERIOD, harmonics=HARMONICS):
+        self.coef = coef  # (parameters, series)
+        self.sigma = sigma  # (series,) residual standard deviation
+        self.xtx_inv = xtx_inv
+        self.n_obs = n_obs
+        self.period = period
+        self.harmonics = harmonics
+
+    @classmethod
+    def fit(cls, history, period=PERIOD, harmonics=HARMONICS):
+        """Fit every row of history (series, months)."""
+        history = np.atleast_2d(np.asarray(history, dtype=np.float64))
+        n_obs = history.shape[1]
+        X = design_matrix(np.arange(n_obs), period, harmonics)
+        if n_obs <= X.shape[1]:
+            raise ValueError(f"Need more than {X.shape[1]} months of history, got {n_obs}")
+        coef, *_ = np.linalg.lstsq(X, history.T, rcond=None)
+        residuals = history.T - X @ coef
+        sigma = np.sqrt((residuals ** 2).sum(axis=0) / (n_obs - X.shape[1]))
+        return cls(coef, sigma, np.linalg.inv(X.T @ X), n_obs, period, harmonics)
+
+    def forecast(self, horizon, level=0.95):
+        """(mean, lower, upper), each (series, horizon), for the months after the history."""
+        from scipy.stats import t as student_t
+
+        X = design_matrix(np.arange(self.n_obs, self.n_obs + horizon), self.period, self.harmonics)
+        mean = (X @ self.coef).T
+        # Variance of a new observation: noise plus the fitted mean's uncertainty
+        leverage = np.einsum("ij,jk,ik->i", X, self.xtx_inv, X)
+        quantile = student_t.ppf(0.5 + level / 2, self.n_obs - X.shape[1])
+        half_width = quantile * self.sigma[:, None] * np.sqrt(1 + leverage)[None, :]
+        return mean, mean - half_width, mean + half_width
+
+
+@lru_cache(maxsize=32)
+def fitted_model(crops, months=36):
+    """SeasonalTrendModel of price_matrix(crops, months), fitted once per process."""
+    return SeasonalTrendModel.fit(price_matrix(crops, months))
+
+
+def add_months(day, months):
+    """First day of the month months after day's month."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def history_months(months=36, today=None):
+    # The history ends with the last complete month
+    today = today or date.today()
+    return [add_months(today, i) for i in range(-months, 0)]
+
+
+def forecast_months(horizon, today=None):
+    # The forecast starts with the current month
+    today = today or date.today()
+    return [add_months(today, i) for i in range(horizon)]
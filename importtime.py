@@ -0,0 +1,134 @@
+"""Import time of each app.py page, measured with ``python -X importtime``.
+
+Every page is run headless (Streamlit's AppTest) in a fresh interpreter,
+so each measurement is a cold start. Streamlit and AppTest themselves are
+imported before a marker and not counted; everything imported after it,
+while the page runs, is: the app's own modules, the model's libraries and
+whatever the page pulls in.
+
+    python importtime.py                  # table per page
+    python importtime.py --top 10         # plus the slowest modules per page
+
+test_importtime.py guards this: Home must not load HOME_EXCLUDED and
+must stay under HOME_BUDGET of the Crop Recommendation page's import
+time, both measured in the same run, so the check holds on any machine.
+benchmark.py reports the per-page totals as import_<page> cases.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+
+PAGES = ["Home", "Crop Recommendation", "Demand Analysis", "Crop Monitoring", "agribot"]
+MARKER = "import time: --- page run starts ---"
+
+# Modules no page should load; a new hit means an import slipped back in
+UNUSED_MODULES = ("matplotlib", "openai")
+# Libraries only other pages need; Home loading one means a page import
+# (or the model load) moved back to the top of app.py
+HOME_EXCLUDED = ("plotly", "sklearn", "xgboost", "scipy", "google", "requests")
+# Home's import time as a fraction of the Crop Recommendation page's,
+# which loads the model's libraries on top of everything Home loads
+HOME_BUDGET = 0.6
+OFFLINE_PROXY = "http://127.0.0.1:9"
+
+# Run in the child interpreter
+_CHILD = """
+import sys
+from streamlit.testing.v1 import AppTest
+
+print({marker!r}, file=sys.stderr, flush=True)
+
+at = AppTest.from_file("app.py", default_timeout=120)
+at.run()
+page = {page!r}
+if page != "Home":
+    at.sidebar.radio[0].set_value(page)
+    at.run()
+if at.exception:
+    raise SystemExit(f"page {{page}} failed: {{at.exception[0].message}}")
+"""
+
+
+def parse_importtime(stderr):
+    """{module: self microseconds} for imports after MARKER."""
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    modules = {}
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            modules[name] = int(self_us)
+    return modules
+
+
+def page_imports(page, cwd="."):
+    """(total ms, {module: self us}) of one cold run of page."""
+    # HTTP(S) goes to a closed local port, so the price API call fails
+    # at once and the page takes its offline fallback
+    env = dict(os.environ, CROP_METRICS_FILE="", HTTP_PROXY=OFFLINE_PROXY, HTTPS_PROXY=OFFLINE_PROXY, NO_PROXY="")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD.format(marker=MARKER, page=page)],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import timing of page {page} failed:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    return sum(modules.values()) / 1000, modules
+
+
+def top_level(modules):
+    return {name.split(".")[0] for name in modules}
+
+
+def unused_imports(modules):
+    return sorted(top_level(modules) & set(UNUSED_MODULES))
+
+
+def home_excluded_imports(modules):
+    return sorted(top_level(modules) & set(HOME_EXCLUDED))
+
+
+def measure(pages=PAGES, repeat=3):
+    """{page: median total ms, min ms, module count and the last run's modules}."""
+    results = {}
+    for page in pages:
+        runs = [page_imports(page) for _ in range(repeat)]
+        totals = [total for total, _ in runs]
+        results[page] = {"median_ms": float(np.median(totals)), "min_ms": float(np.min(totals)),
+                         "repeat": repeat, "modules": len(runs[-1][1]), "self_us": runs[-1][1]}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import time of each app.py page")
+    parser.add_argument("--pages", nargs="+", default=PAGES, choices=PAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest modules per page")
+    args = parser.parse_args(argv)
+
+    results = measure(args.pages, args.repeat)
+    print(f"{'page':<22}{'import ms':>11}{'min ms':>9}{'modules':>9}")
+    for page, r in results.items():
+        print(f"{page:<22}{r['median_ms']:>11.0f}{r['min_ms']:>9.0f}{r['modules']:>9}")
+    for page, r in results.items():
+        if args.top:
+            print(f"\n{page}:")
+            for name, us in sorted(r["self_us"].items(), key=lambda item: -item[1])[:args.top]:
+                print(f"  {us / 1000:>8.1f} ms  {name}")
+    unused = {page: unused_imports(r["self_us"]) for page, r in results.items()}
+    unused = {page: names for page, names in unused.items() if names}
+    for page, names in unused.items():
+        print(f"\n{page} imports unused modules: {', '.join(names)}")
+    excluded = home_excluded_imports(results["Home"]["self_us"]) if "Home" in results else []
+    if excluded:
+        print(f"\nHome imports {', '.join(excluded)}")
+    return 1 if unused or excluded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
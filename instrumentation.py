@@ -0,0 +1,84 @@
+"""Per-section timings for the Streamlit app.
+
+app.py opens a Rerun at the top of every script run and wraps its slow
+blocks (model load, price and weather API calls, predictions, Plotly
+figures, Gemini calls) in rerun.section(name). The timings go into
+histograms labelled by page and section in metrics.REGISTRY, which is
+process-wide, so every session adds to the same histograms.
+
+    CROP_METRICS_FILE   write the histograms to this Prometheus text file,
+                        at most once per CROP_METRICS_INTERVAL seconds
+                        (default 10); off unless set
+    CROP_METRICS_PORT   also serve GET /metrics on this local port
+    CROP_PROFILE_DIR    profile every rerun with cProfile and write
+                        <dir>/<page>-<timestamp>.prof (view with snakeviz
+                        or python -m pstats)
+
+Reruns cut short by st.rerun() or st.stop() record their sections but
+not the whole-rerun time.
+"""
+import cProfile
+import os
+import re
+import time
+from datetime import datetime
+
+from metrics import REGISTRY, span, start_http_server, write_text_file
+
+
+METRICS_FILE = os.environ.get("CROP_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("CROP_METRICS_INTERVAL", 10))
+METRICS_PORT = os.environ.get("CROP_METRICS_PORT")
+PROFILE_DIR = os.environ.get("CROP_PROFILE_DIR")
+
+SECTION_SECONDS = REGISTRY.histogram("crop_app_section_seconds", "Time spent in one block of app.py",
+                                     labels=("page", "section"))
+RERUN_SECONDS = REGISTRY.histogram("crop_app_rerun_seconds", "Time of one full script run of app.py",
+                                   labels=("page",))
+
+
+class Rerun:
+    """Timings (and optionally a profile) of one script run."""
+
+    def __init__(self, profile_dir=None):
+        self.page = "app"  # until the sidebar has picked one
+        self.start = time.perf_counter()
+        self.profile_dir = profile_dir
+        self.profiler = None
+        if profile_dir:
+            # cProfile hooks only the calling thread, which is this
+            # session's script thread
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def section(self, name):
+        return span(SECTION_SECONDS, self.page, name)
+
+    def finish(self):
+        RERUN_SECONDS.observe(time.perf_counter() - self.start, self.page)
+        if self.profiler:
+            self.profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = re.sub(r"\W+", "_", self.page.lower())
+            self.profiler.dump_stats(os.path.join(self.profile_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof"))
+        if METRICS_FILE:
+            _write_metrics_file()
+
+
+_last_write = None
+
+
+def _write_metrics_file():
+    # Reruns come from every session; rendering and rewriting the file on
+    # each one would put disk I/O on every interaction
+    global _last_write
+    now = time.monotonic()
+    if _last_write is None or now - _last_write >= METRICS_INTERVAL:
+        _last_write = now
+        write_text_file(METRICS_FILE)
+
+
+def start_rerun():
+    if METRICS_PORT:
+        start_http_server(int(METRICS_PORT))
+    return Rerun(PROFILE_DIR)
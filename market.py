@@ -0,0 +1,142 @@
+"""Market price simulation and profit calculations for the Demand Analysis page.
+
+Kept out of app.py so they can be benchmarked and reused without running
+Streamlit.
+"""
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+
+# The crops of the Demand Analysis page
+MARKET_CROPS = ["Wheat", "Rice", "Maize", "Sugarcane", "Barley", "Soybean", "Cotton", "Potato", "Tomato", "Onion",
+                "Groundnut", "Mustard", "Turmeric", "Chilli", "Jute", "Coffee", "Mango"]
+
+# Independent random streams per crop; adding a stream never shifts another
+TREND_STREAM = 0
+SPOT_STREAM = 1
+RISK_STREAM = 2
+
+
+def crop_rng(crop_name, stream=TREND_STREAM):
+    """Generator for one crop and stream, identical in every process.
+
+    Python's str hash is salted per process, so it is not used; crc32 of
+    the lowercase name is stable across workers and restarts.
+    """
+    return np.random.Generator(np.random.PCG64([stream, zlib.crc32(crop_name.lower().encode())]))
+
+
+def simulate_prices(crops, months=36):
+    """(len(crops), months) int matrix of simulated monthly prices.
+
+    Each crop's parameters and noise come from its own stream, so a crop's
+    row does not depend on which other crops are simulated with it. The
+    draws are per crop; trend, seasonality and noise are then combined for
+    all crops in one pass.
+    """
+    # Four uniforms and the noise per crop; scaled to their ranges below
+    u = np.empty((len(crops), 4))
+    noise = np.empty((len(crops), months))
+    for i, crop in enumerate(crops):
+        rng = crop_rng(crop)
+        u[i] = rng.random(4)
+        noise[i] = rng.standard_normal(months)
+    base_price = np.floor(2000 + 4000 * u[:, [0]])  # 2000-5999
+    trend_factor = -0.5 + 1.5 * u[:, [1]]  # Negative to positive trend
+    seasonality = 0.1 + 0.2 * u[:, [2]]  # Seasonal variation magnitude
+    noise_level = 0.05 + 0.1 * u[:, [3]]  # Random noise amount
+
+    # Create time-based components
+    time = np.arange(months)
+    trend = base_price * (1 + trend_factor * time / months)
+    season = seasonality * base_price * np.sin(2 * np.pi * time / 12)
+
+    # Create price series with trend, seasonality and noise
+    return (trend + season + noise_level * base_price * noise).astype(int)
+
+
+@lru_cache(maxsize=32)
+def price_matrix(crops, months=36):
+    """simulate_prices for a tuple of crops, computed once per process and
+    shared by every session; the matrix is read-only."""
+    prices = simulate_prices(crops, months)
+    prices.setflags(write=False)
+    return prices
+
+
+def generate_trend_data(crop_name, months=36):
+    """One crop's simulated price history (a row of simulate_prices)."""
+    return simulate_prices([crop_name], months)[0]
+
+
+# Storage strategy: (cost per acre in ₹, price increase, description)
+STORAGE_OPTIONS = {
+    "Sell Immediately": (0, 0, "No storage costs, but missing potential higher prices"),
+    "Short-term Storage (1-3 months)": (200, 0.05, "Medium storage costs, potential for better prices"),
+    "Long-term Storage (3-6 months)": (500, 0.12, "Higher storage costs, but best chance for peak prices"),
+}
+
+# Processing level: (cost per acre in ₹, price increase, description)
+PROCESSING_OPTIONS = {
+    "No Processing": (0, 0, "No additional costs, base market prices"),
+    "Basic Processing": (1500, 0.15, "Sorting, cleaning, packaging for better prices"),
+    "Advanced Processing": (4000, 0.35, "Value-added processing for premium markets"),
+}
+
+# Marketing channel price relative to the strategy price
+CHANNEL_PRICE_FACTORS = {
+    "Local Market": 0.9,
+    "Wholesale Market": 1.0,
+    "Direct to Consumer": 1.3,
+    "Export Market": 1.5,
+}
+
+
+def yield_quintals_per_acre(expected_yield_t_ha):
+    # Convert expected yield to per acre (since yield is given per hectare)
+    expected_yield_per_acre = expected_yield_t_ha / 2.47  # (1 hectare = 2.47 acres)
+    # Convert quintal to tons if needed (1 ton = 10 quintals)
+    return expected_yield_per_acre * 10
+
+
+def profit_summary(market_price, expected_yield_t_ha, land_area_acre, cost_per_acre, quality_premium=0,
+                   organic_premium=0, storage_option="Sell Immediately", processing_option="No Processing"):
+    """Base and strategy revenue, cost and profit for one crop and field."""
+    expected_yield_quintals = yield_quintals_per_acre(expected_yield_t_ha)
+
+    # Calculate base case values (before adjustments)
+    base_total_revenue = market_price * expected_yield_quintals * land_area_acre
+    base_total_cost = cost_per_acre * land_area_acre
+    base_profit = base_total_revenue - base_total_cost
+
+    # Apply market factors to price
+    adjusted_price = market_price * (1 + quality_premium/100) * (1 + organic_premium/100)
+
+    storage_cost_acre, price_benefit, _ = STORAGE_OPTIONS[storage_option]
+    processing_cost_acre, processing_benefit, _ = PROCESSING_OPTIONS[processing_option]
+    storage_cost = storage_cost_acre * land_area_acre
+    processing_cost = processing_cost_acre * land_area_acre
+
+    # Apply storage and processing to final price
+    final_price = adjusted_price * (1 + price_benefit) * (1 + processing_benefit)
+    total_post_harvest_cost = storage_cost + processing_cost
+
+    # Recalculate revenue and profit with all factors
+    total_adjusted_revenue = final_price * expected_yield_quintals * land_area_acre
+    total_cost_with_post_harvest = base_total_cost + total_post_harvest_cost
+    adjusted_profit = total_adjusted_revenue - total_cost_with_post_harvest
+
+    return {
+        "base_total_revenue": base_total_revenue,
+        "base_total_cost": base_total_cost,
+        "base_profit": base_profit,
+        "final_price": final_price,
+        "total_post_harvest_cost": total_post_harvest_cost,
+        "total_adjusted_revenue": total_adjusted_revenue,
+        "total_cost_with_post_harvest": total_cost_with_post_harvest,
+        "adjusted_profit": adjusted_profit,
+        "adjusted_profit_margin": (adjusted_profit / total_adjusted_revenue) * 100 if total_adjusted_revenue > 0 else 0,
+        "adjusted_roi": (adjusted_profit / total_cost_with_post_harvest) * 100 if total_cost_with_post_harvest > 0 else 0,
+    }
@@ -0,0 +1,155 @@
+"""Minimal thread-safe metrics with Prometheus text exposition.
+
+Kept dependency-free so the Streamlit app and the HTTP service can both
+record timings without pulling in prometheus_client.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds; fine-grained at the low end where model calls live
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, optionally split by label values."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {label_values}")
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts plus an overflow slot for +Inf
+                series = self._series[label_values] = {"counts": [0] * (len(self.buckets) + 1),
+                                                       "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]}
+                    for key, s in self._series.items()}
+
+    def quantile(self, q, *label_values):
+        # Upper bound of the bucket holding the q-th observation
+        series = self.snapshot().get(tuple(label_values))
+        if not series or not series["count"]:
+            return None
+        target = q * series["count"]
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            running = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                running += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', repr(bound)))} {running}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        # Returns the existing histogram on repeat calls, so callers can
+        # declare their metrics at import time or lazily without duplicates
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help_text, labels, buckets)
+            return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def span(histogram, *label_values):
+    """Time the with-block into histogram, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+
+def write_text_file(path, registry=REGISTRY):
+    # Written to a temporary file and renamed, so a scraper (e.g. the node
+    # exporter's textfile collector) never reads a half-written file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as file:
+        file.write(registry.render())
+    os.replace(tmp, path)
+
+
+_server_lock = threading.Lock()
+_servers = {}
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Serve GET /metrics from a daemon thread; once per port and process."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if port not in _servers:
+            server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True, name=f"metrics-{port}").start()
+            _servers[port] = server
+        return _servers[port]
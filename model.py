@@ -1,57 +1,208 @@
-import pandas as pd
+"""Train the crop recommendation model and save it as a model artifact.
+
+    python model.py --n-iter 40 --cv 3
+
+Run ``python model.py --help`` for all options.
+"""
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, RandomizedSearchCV
-from sklearn.ensemble import RandomForestClassifier
+from scipy.stats import loguniform, randint, uniform
+from sklearn.model_selection import train_test_split, RandomizedSearchCV
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from imblearn.combine import SMOTETomek
 from xgboost import XGBClassifier
-import pickle
-import streamlit as st
+from artifacts import ARTIFACT_DIR, BoosterClassifier, preprocessing_arrays, preprocessing_from_arrays, save_artifact
+from dataset import DATASET_PATH, load_dataset
+from feature_selection import select_features
+from preprocess_cache import CACHE_DIR, PreprocessCache
+from resampling import METHODS as RESAMPLE_METHODS, cache_params as resample_params, resample
 
 
+# Select 10 most relevant features (the default; --select-features picks them from the data)
+selected_features = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall', 'soil_moisture', 'soil_type', 'sunlight_exposure']
 
-# Load dataset
-df = pd.read_csv("Crop_recommendationV2.csv")
+# Search space for RandomizedSearchCV. n_estimators is only an upper bound:
+# early stopping on the validation fold picks the actual number of rounds.
+param_distributions = {
+    'learning_rate': loguniform(0.02, 0.3),
+    'max_depth': randint(3, 11),
+    'min_child_weight': loguniform(0.5, 10),
+    'subsample': uniform(0.6, 0.4),
+    'colsample_bytree': uniform(0.6, 0.4),
+    'gamma': [0, 0.05, 0.1, 0.5, 1.0],
+    'reg_lambda': loguniform(0.1, 10),
+    'max_bin': [64, 128, 256],
+}
 
-# Encode target variable (label)
-le = LabelEncoder()
-df['label'] = le.fit_transform(df['label'])
 
-# Select 10 most relevant features
-selected_features = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall', 'soil_moisture', 'soil_type', 'sunlight_exposure']
-X = df[selected_features]
-y = df['label']
+class StageTimer:
+    """Wall-clock time per pipeline stage, printed as a table at the end."""
 
-# Feature Scaling
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
+    def __init__(self):
+        self.stages = {}
 
-# Split dataset
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - start
+            print(f"[{name}] {self.stages[name]:.2f}s")
 
-# Handle class imbalance using SMOTETomek
-smote_tomek = SMOTETomek(random_state=42)
-X_train, y_train = smote_tomek.fit_resample(X_train, y_train)
+    def report(self):
+        total = sum(self.stages.values())
+        lines = ["", f"{'stage':<12}{'seconds':>10}{'share':>8}"]
+        for name, seconds in self.stages.items():
+            lines.append(f"{name:<12}{seconds:>10.2f}{seconds / total:>8.0%}")
+        lines.append(f"{'total':<12}{total:>10.2f}")
+        return "\n".join(lines)
 
-# Hyperparameter tuning using RandomizedSearchCV
-param_grid = {
-    'n_estimators': [100, 200],
-    'learning_rate': [0.1],
-    'max_depth': [6, 10]
-}
 
-random_search = RandomizedSearchCV(XGBClassifier(random_state=42), param_distributions=param_grid, cv=3, n_iter=5, scoring='accuracy', n_jobs=-1, random_state=42)
-random_search.fit(X_train, y_train)
+def thread_budget(n_jobs, xgb_threads, n_fits):
+    # Parallel CV fits x xgboost threads per fit must not exceed the cores,
+    # otherwise joblib workers and OpenMP threads fight over them
+    cpus = os.cpu_count() or 1
+    if n_jobs is None or n_jobs <= 0:
+        n_jobs = max(1, min(n_fits, cpus // (xgb_threads or 1)))
+    if not xgb_threads:
+        xgb_threads = max(1, cpus // n_jobs)
+    return n_jobs, xgb_threads
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the crop recommendation model")
+    parser.add_argument("--data", default=DATASET_PATH, help="training CSV")
+    parser.add_argument("--out", default=ARTIFACT_DIR, help="artifact directory to write")
+    parser.add_argument("--n-iter", type=int, default=30, help="hyperparameter combinations to try")
+    parser.add_argument("--cv", type=int, default=3, help="cross-validation folds per combination")
+    parser.add_argument("--n-jobs", type=int, default=None,
+                        help="parallel CV fits (default: cores / xgboost threads)")
+    parser.add_argument("--xgb-threads", type=int, default=None,
+                        help="threads per xgboost fit (default: cores / parallel fits)")
+    parser.add_argument("--max-estimators", type=int, default=1000, help="upper bound on boosting rounds")
+    parser.add_argument("--early-stopping-rounds", type=int, default=30)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--val-size", type=float, default=0.15,
+                        help="share of the training split held out for early stopping")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--resample", default="smotetomek", choices=RESAMPLE_METHODS,
+                        help="class-imbalance handling; smote and class_weight are much faster on large data")
+    parser.add_argument("--select-features", action="store_true",
+                        help="pick the features by accuracy vs serving cost instead of the fixed list")
+    parser.add_argument("--selection-tolerance", type=float, default=0.005,
+                        help="accuracy given up for a cheaper feature subset")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where preprocessing stages are cached")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every preprocessing stage")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timer = StageTimer()
+    n_jobs, xgb_threads = thread_budget(args.n_jobs, args.xgb_threads, args.n_iter * args.cv)
+    print(f"Using {n_jobs} parallel fits x {xgb_threads} xgboost threads")
+
+    cache = PreprocessCache(args.data, root=args.cache_dir, enabled=not args.no_cache)
+
+    # Optionally replace the fixed feature list with the cheapest subset on
+    # the accuracy / latency / size Pareto front (see feature_selection.py)
+    features = list(selected_features)
+    selection = None
+    if args.select_features:
+        def select():
+            chosen, front = select_features(args.data, test_size=args.test_size, tolerance=args.selection_tolerance,
+                                            n_jobs=xgb_threads, seed=args.seed)
+            return {"features": np.array(chosen["features"]), "front": np.array(json.dumps(front))}
+
+        with timer.stage("select"):
+            _, arrays = cache.stage("select", {"tolerance": args.selection_tolerance, "test_size": args.test_size,
+                                               "seed": args.seed}, select)
+            features = [str(name) for name in arrays["features"]]
+            selection = {"tolerance": args.selection_tolerance, "front": json.loads(str(arrays["front"]))}
+        print(f"Selected {len(features)} features: {', '.join(features)}")
+
+    def encode():
+        # Load dataset
+        df = load_dataset(args.data, columns=features + ['label'])
+        # Encode target variable (label)
+        le = LabelEncoder()
+        y = le.fit_transform(df['label'].astype(str))
+        # Feature Scaling, in float64 like the inputs at prediction time
+        scaler = StandardScaler()
+        X = scaler.fit_transform(df[features].to_numpy(dtype=np.float64))
+        return dict(preprocessing_arrays(le, scaler), X=X, y=y)
+
+    with timer.stage("preprocess"):
+        preprocess_key, arrays = cache.stage("preprocess", {"features": features}, encode)
+        le, scaler = preprocessing_from_arrays(arrays)
+        X, y = arrays["X"], arrays["y"]
+
+    def split():
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=args.test_size, random_state=args.seed)
+        # Held-out fold for early stopping; it is never resampled or searched on
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=args.val_size,
+                                                      stratify=y_train, random_state=args.seed)
+        return {"X_fit": X_fit, "X_val": X_val, "X_test": X_test,
+                "y_fit": y_fit, "y_val": y_val, "y_test": y_test}
+
+    with timer.stage("split"):
+        split_key, arrays = cache.stage("split", {"test_size": args.test_size, "val_size": args.val_size,
+                                                  "seed": args.seed}, split, parent=preprocess_key)
+        X_fit, X_val, X_test = arrays["X_fit"], arrays["X_val"], arrays["X_test"]
+        y_fit, y_val, y_test = arrays["y_fit"], arrays["y_val"], arrays["y_test"]
+
+    # Handle class imbalance (SMOTETomek by default, see resampling.py)
+    def resample_fit():
+        X_res, y_res, weights = resample(args.resample, X_fit, y_fit, seed=args.seed, n_jobs=n_jobs)
+        arrays = {"X": X_res, "y": y_res}
+        if weights is not None:
+            arrays["sample_weight"] = weights
+        return arrays
+
+    with timer.stage("resample"):
+        _, arrays = cache.stage("resample", resample_params(args.resample, args.seed), resample_fit,
+                                parent=split_key)
+        X_fit, y_fit = arrays["X"], arrays["y"]
+        sample_weight = arrays.get("sample_weight")
+    print(cache.summary())
+
+    # Hyperparameter tuning using RandomizedSearchCV with histogram trees and early stopping
+    with timer.stage("search"):
+        estimator = XGBClassifier(tree_method='hist', n_estimators=args.max_estimators,
+                                  early_stopping_rounds=args.early_stopping_rounds, eval_metric='mlogloss',
+                                  n_jobs=xgb_threads, random_state=args.seed)
+        random_search = RandomizedSearchCV(estimator, param_distributions=param_distributions, n_iter=args.n_iter,
+                                           cv=args.cv, scoring='accuracy', n_jobs=n_jobs, refit=True,
+                                           random_state=args.seed)
+        random_search.fit(X_fit, y_fit, sample_weight=sample_weight, eval_set=[(X_val, y_val)], verbose=False)
+
+    # The refit best estimator is the final model; no second training run
+    model = random_search.best_estimator_
+    best_rounds = model.best_iteration + 1
+
+    with timer.stage("evaluate"):
+        accuracy = model.score(X_test, y_test)
+
+    with timer.stage("save"):
+        # Keep only the rounds up to the early-stopping optimum
+        final_model = BoosterClassifier(model.get_booster()[:best_rounds], len(le.classes_))
+        metrics = {"accuracy": float(accuracy), "cv_accuracy": float(random_search.best_score_),
+                   "boosting_rounds": int(best_rounds), "resample": args.resample}
+        params = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in random_search.best_params_.items()}
+        manifest = save_artifact(args.out, final_model, le, scaler, features=features, dataset_path=args.data,
+                                 metrics=metrics, extra={"params": params, "timings": timer.stages, "feature_selection": selection})
 
-# Train best XGBoost model
-best_params = random_search.best_params_
-model = XGBClassifier(**best_params, random_state=42)
-model.fit(X_train, y_train)
+    print(timer.report())
+    print(f"\nModel training completed with optimized XGBoost and saved to '{args.out}' (version {manifest['version']})")
+    print(f"Best parameters: {params}")
+    print(f"Boosting rounds after early stopping: {best_rounds}")
+    print(f"Model Accuracy: {accuracy:.2f}")
 
-# Save the model
-with open("crop_prediction_model.pkl", "wb") as file:
-    pickle.dump((model, le, scaler), file)
 
-print("Model training completed with optimized XGBoost and saved as 'crop_prediction_model.pkl'")
-accuracy = model.score(X_test, y_test)
-print(f"Model Accuracy: {accuracy:.2f}")
+if __name__ == "__main__":
+    main()
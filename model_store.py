@@ -0,0 +1,179 @@
+"""Process-wide holder for the trained crop model.
+
+Streamlit re-executes app.py on every rerun, but imported modules stay in
+sys.modules, so a holder kept here is loaded once per process and shared by
+every session. The holder watches the model file and swaps in a new model
+when its contents change.
+
+Both the artifact directory written by model.py and the older pickled
+(model, le, scaler) tuple can be served; the artifact is preferred when
+both exist.
+"""
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from artifacts import ARTIFACT_DIR, COMPACT_DIR, DEFAULT_FEATURES, MANIFEST_FILE, file_sha256, is_artifact, load_artifact
+from backends import warm_up
+from neighbors import prepare_field_index
+
+
+PICKLE_PATH = "crop_prediction_model.pkl"
+VARIANT_ENV = "CROP_MODEL_VARIANT"
+
+
+def default_model_path(variant=None):
+    """Path of the 'full' or 'compact' model (default: $CROP_MODEL_VARIANT or full).
+
+    The compact variant is written by compress.py; without it the full
+    model is used.
+    """
+    variant = variant or os.environ.get(VARIANT_ENV, "full")
+    if variant == "compact" and is_artifact(COMPACT_DIR):
+        return COMPACT_DIR
+    return ARTIFACT_DIR if is_artifact(ARTIFACT_DIR) else PICKLE_PATH
+
+
+def watched_file(path):
+    # For an artifact directory the manifest is written last and carries the
+    # checksums of the other files, so it alone identifies the version
+    return os.path.join(path, MANIFEST_FILE) if os.path.isdir(path) else path
+
+
+def load_model_file(path):
+    """Return (model, le, scaler, manifest); manifest is None for a pickle."""
+    if os.path.isdir(path):
+        return load_artifact(path)
+    # Legacy format: the pickle holds the (model, le, scaler) tuple
+    with open(path, "rb") as file:
+        model, le, scaler = pickle.load(file)
+    return model, le, scaler, None
+
+
+class LoadedModel:
+    """One immutable snapshot of the model, label encoder and scaler."""
+
+    def __init__(self, model, le, scaler, path, version, mtime, load_seconds, manifest=None):
+        self.model = model
+        self.le = le
+        self.scaler = scaler
+        self.manifest = manifest
+        self.features = list(manifest["features"]) if manifest else DEFAULT_FEATURES
+        self.path = path
+        self.version = version
+        self.mtime = mtime
+        self.load_seconds = load_seconds
+        self.loaded_at = datetime.now()
+
+    def info(self):
+        return {
+            "path": self.path,
+            "format": "artifact" if self.manifest else "pickle",
+            "version": self.version,
+            "file_modified": datetime.fromtimestamp(self.mtime).isoformat(timespec="seconds"),
+            "loaded_at": self.loaded_at.isoformat(timespec="seconds"),
+            "load_seconds": round(self.load_seconds, 4),
+        }
+
+
+class ModelHolder:
+    """Keeps the current LoadedModel and reloads it when the file changes.
+
+    Readers call get() and use the returned snapshot for the whole request,
+    so a reload never mixes a new model with an old scaler. The file is
+    stat()ed at most once per check_interval seconds; it is only re-hashed
+    when its mtime or size moved, and only reloaded when the hash differs.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.watched = watched_file(path)
+        self.check_interval = check_interval
+        self.reload_count = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._current = None
+        self._stat = None
+        self._hash = None
+        self._last_check = 0.0
+
+    def get(self):
+        current = self._current
+        if current is None or time.monotonic() - self._last_check >= self.check_interval:
+            current = self._refresh()
+        return current
+
+    def reload(self, force=False):
+        return self._refresh(force=force)
+
+    def _refresh(self, force=False):
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                stat = os.stat(self.watched)
+            except OSError as e:
+                if self._current is None:
+                    raise
+                self.last_error = str(e)
+                return self._current
+
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if self._current is not None and not force and stat_key == self._stat:
+                return self._current
+
+            content_hash = file_sha256(self.watched)
+            if self._current is not None and not force and content_hash == self._hash:
+                # Touched but not changed, e.g. a copy that kept the same bytes
+                self._stat = stat_key
+                return self._current
+
+            try:
+                start = time.perf_counter()
+                model, le, scaler, manifest = load_model_file(self.path)
+                load_seconds = time.perf_counter() - start
+            except Exception as e:
+                # A half-written file must not take the app down; keep serving
+                # the previous model and try again on the next check.
+                if self._current is None:
+                    raise
+                self.last_error = str(e)
+                return self._current
+
+            # Single reference assignment, so readers see either the old or
+            # the new snapshot and never a mix of the two
+            version = manifest["version"] if manifest else content_hash[:12]
+            self._current = LoadedModel(model, le, scaler, self.path, version,
+                                        stat.st_mtime, load_seconds, manifest)
+            self._stat = stat_key
+            self._hash = content_hash
+            self.reload_count += 1
+            self.last_error = None
+            # Pick the inference backends and build the similar-fields
+            # index now, off the serving path
+            warm_up(self._current)
+            prepare_field_index(self._current)
+            return self._current
+
+    def info(self):
+        current = self.get()
+        info = current.info()
+        info["reload_count"] = self.reload_count
+        info["last_error"] = self.last_error
+        return info
+
+
+_holders = {}
+_holders_lock = threading.Lock()
+
+
+def get_model_holder(path=None, variant=None):
+    # One holder per model path per process
+    path = path or default_model_path(variant)
+    with _holders_lock:
+        holder = _holders.get(path)
+        if holder is None:
+            holder = ModelHolder(path)
+            _holders[path] = holder
+        return holder
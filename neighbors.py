@@ -0,0 +1,133 @@
+"""Nearest-neighbour index of the labelled training fields.
+
+A KD-tree over the dataset rows in the model's scaled feature space, so
+"similar" means similar to what the model sees. It is prepared once per
+model version, in the background as soon as model_store loads the model.
+Its rows are saved next to the model (``neighbors.npz``, plain arrays,
+nothing pickled); later starts load them and rebuild the tree, which
+takes milliseconds, as long as the model version and dataset hash still
+match.
+"""
+import json
+import os
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from artifacts import file_sha256
+from dataset import DATASET_PATH, load_dataset
+
+
+INDEX_FILE = "neighbors.npz"
+
+
+def index_path(model_path):
+    if os.path.isdir(model_path):
+        return os.path.join(model_path, INDEX_FILE)
+    return os.path.splitext(model_path)[0] + "." + INDEX_FILE
+
+
+def dataset_path_for(loaded):
+    # Prefer the dataset the model was trained on, when it is still around
+    recorded = (loaded.manifest or {}).get("dataset", {}).get("path")
+    if recorded and os.path.exists(recorded):
+        return recorded
+    return DATASET_PATH
+
+
+class FieldIndex:
+    def __init__(self, loaded, labels, fields, features, key, leaf_size=30):
+        from sklearn.neighbors import KDTree
+
+        self.tree = KDTree(loaded.scaler.transform(fields), leaf_size=leaf_size)
+        self.labels = labels
+        self.fields = fields
+        self.features = features
+        self.key = key
+
+    @classmethod
+    def build(cls, loaded, dataset_path, key=None):
+        df = load_dataset(dataset_path, columns=loaded.features + ["label"])
+        fields = df[loaded.features].to_numpy(dtype=np.float64)
+        return cls(loaded, df["label"].astype(str).to_numpy(), fields, list(loaded.features), key)
+
+    def save(self, path):
+        # np.savez appends .npz to names without it
+        tmp = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp, labels=self.labels.astype(str), fields=self.fields,
+                 features=np.asarray(self.features, dtype=str), key=np.asarray(json.dumps(self.key)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, loaded):
+        """The saved rows, with the tree rebuilt in loaded's scaled space."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(loaded, data["labels"], data["fields"], list(data["features"]), json.loads(str(data["key"])))
+
+    def query(self, loaded, X, k=5):
+        """(distances, indices), each (rows, k), for unscaled input rows."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.features))
+        return self.tree.query(loaded.scaler.transform(X), k=min(k, len(self.labels)))
+
+    def similar_fields(self, loaded, X, k=5):
+        """One DataFrame per input row: the k closest fields and their crops."""
+        distances, indices = self.query(loaded, X, k)
+        tables = []
+        for dist, idx in zip(distances, indices):
+            table = pd.DataFrame(self.fields[idx], columns=self.features)
+            table.insert(0, "Crop", self.labels[idx])
+            table.insert(1, "Distance", dist)
+            tables.append(table)
+        return tables
+
+
+_indexes = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def prepare_field_index(loaded):
+    """Load or build the index for loaded on a background thread.
+
+    model_store calls this whenever it loads a model, so the first lookup
+    finds the index ready. A failure here is not reported; the lookup
+    retries in the caller's thread and raises there.
+    """
+    def prepare():
+        try:
+            get_field_index(loaded)
+        except Exception:
+            pass
+
+    threading.Thread(target=prepare, daemon=True, name="field-index").start()
+
+
+def get_field_index(loaded, dataset_path=None):
+    """The index for a model_store.LoadedModel snapshot, loaded or built once."""
+    with _lock:
+        index = _indexes.get(loaded)
+        if index is not None:
+            return index
+
+        dataset_path = dataset_path or dataset_path_for(loaded)
+        key = {"model_version": loaded.version, "dataset_sha256": file_sha256(dataset_path),
+               "features": list(loaded.features)}
+        path = index_path(loaded.path)
+        index = None
+        if os.path.exists(path):
+            try:
+                index = FieldIndex.load(path, loaded)
+            except Exception:
+                index = None
+            if index is not None and index.key != key:
+                index = None
+        if index is None:
+            index = FieldIndex.build(loaded, dataset_path, key)
+            try:
+                index.save(path)
+            except OSError:
+                # Read-only deployments still get the in-memory index
+                pass
+        _indexes[loaded] = index
+        return index
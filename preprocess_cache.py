@@ -0,0 +1,76 @@
+"""On-disk cache of the training preprocessing stages.
+
+Every stage output (encoded labels and scaled matrix, the train/validation/
+test split, the resampled training set) is saved as an uncompressed ``.npz``
+file under ``.cache/preprocess``. The file name is a hash of the dataset
+contents, the stage name, its parameters and the key of the stage it was
+computed from, so a rerun with the same data and settings loads the arrays
+instead of recomputing them, and any change upstream invalidates everything
+below it.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from artifacts import file_sha256
+
+
+CACHE_DIR = os.environ.get("CROP_CACHE_DIR", ".cache")
+# Bump when the layout of cached arrays changes
+CACHE_FORMAT = 1
+
+
+class PreprocessCache:
+    def __init__(self, dataset_path, root=CACHE_DIR, enabled=True):
+        self.directory = os.path.join(root, "preprocess")
+        self.dataset_sha256 = file_sha256(dataset_path)
+        self.enabled = enabled
+        self.hits = []
+        self.misses = []
+
+    def key(self, stage, params, parent=None):
+        payload = {"format": CACHE_FORMAT, "dataset": self.dataset_sha256, "stage": stage,
+                   "params": params, "parent": parent}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, stage, key):
+        return os.path.join(self.directory, f"{stage}-{key[:16]}.npz")
+
+    def stage(self, stage, params, compute, parent=None):
+        """Return (key, arrays) for a stage, computing and saving on a miss.
+
+        compute() must return a dict of NumPy arrays (no object dtype).
+        """
+        key = self.key(stage, params, parent)
+        path = self.path(stage, key)
+        if self.enabled and os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    arrays = {name: data[name] for name in data.files}
+                self.hits.append(stage)
+                return key, arrays
+            except (OSError, ValueError):
+                # Truncated or corrupt entry: recompute and overwrite it
+                pass
+
+        arrays = compute()
+        self.misses.append(stage)
+        if self.enabled:
+            self._save(path, arrays)
+        return key, arrays
+
+    def _save(self, path, arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = path[:-len(".npz")] + ".tmp.npz"
+        try:
+            np.savez(tmp, **arrays)
+            os.replace(tmp, path)
+        except OSError:
+            # A read-only checkout still trains, just without the cache
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def summary(self):
+        return f"preprocess cache: {len(self.hits)} hit(s) {self.hits}, {len(self.misses)} miss(es) {self.misses}"
@@ -0,0 +1,109 @@
+"""Local stand-in for the market price API, for tests and offline demos.
+
+    GET /prices          every crop, as {"crops": [...]} like the mock API
+    GET /prices/<code>   one crop's record, for per-crop fetching
+    GET /stats           requests and distinct client connections served
+
+Prices are derived from the crop code, so they are the same on every run.
+--delay and --fail-rate make it slow or flaky, to exercise the retries
+and the concurrency cap in prices.py. --fail-first and --fail-codes fail
+deterministically, for tests: the first N requests of every path, or
+every request for the given crop codes.
+
+    python price_server.py --port 8765 --delay 0.2 --fail-rate 0.2
+    CROP_PRICE_API_URL='http://127.0.0.1:8765/prices/{code}' streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from market import MARKET_CROPS
+
+
+def price_record(code, name=None):
+    seed = zlib.crc32(code.upper().encode())
+    modal = 1500 + seed % 9000
+    return {
+        "name": name or code.title(),
+        "modal_price": str(modal),
+        "min_price": str(int(modal * 0.92)),
+        "max_price": str(int(modal * 1.08)),
+        "last_updated": date.today().isoformat(),
+        "market_name": ("Azadpur", "Vashi", "Koyambedu", "Bowenpally")[seed % 4],
+        "trend": ("up", "down", "stable")[seed % 3],
+    }
+
+
+def make_server(port=8765, host="127.0.0.1", delay=0.0, fail_rate=0.0, seed=0, fail_first=0, fail_codes=()):
+    rng = random.Random(seed)
+    fail_codes = {code.upper() for code in fail_codes}
+    stats_lock = threading.Lock()
+    stats = {"requests": 0, "failures": 0, "connections": set(), "paths": {}}
+
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections open, so a pooled client reuses them
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/stats":
+                with stats_lock:
+                    self._send(200, {"requests": stats["requests"], "failures": stats["failures"],
+                                     "connections": len(stats["connections"]), "paths": stats["paths"]})
+                return
+            with stats_lock:
+                stats["requests"] += 1
+                stats["connections"].add(self.client_address)
+                seen = stats["paths"][path] = stats["paths"].get(path, 0) + 1
+                fail = (rng.random() < fail_rate or seen <= fail_first
+                        or path.rpartition("/")[2].upper() in fail_codes)
+                if fail:
+                    stats["failures"] += 1
+            if delay:
+                time.sleep(delay)
+            if fail:
+                self._send(503, {"error": "simulated outage"})
+            elif path == "/prices":
+                self._send(200, {"crops": [price_record(name.upper(), name) for name in MARKET_CROPS]})
+            elif path.startswith("/prices/"):
+                self._send(200, price_record(path[len("/prices/"):]))
+            else:
+                self._send(404, {"error": f"No route for {path}"})
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve deterministic crop prices locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--fail-first", type=int, default=0, help="answer the first N requests of every path with 503")
+    parser.add_argument("--fail-codes", nargs="*", default=(), help="crop codes always answered with 503")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.port, args.host, args.delay, args.fail_rate, fail_first=args.fail_first,
+                         fail_codes=args.fail_codes)
+    print(f"Serving prices on http://{args.host}:{args.port}/prices")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Process-wide cache of market prices for the Demand Analysis page.
+
+The price API returns every crop in one response. The cache keeps that
+response indexed by lowercase crop name, so a lookup is one dict access
+instead of a scan of the list, and every session in the process shares it.
+
+    fresh   (younger than ttl)       served from memory
+    stale   (older than ttl)         served from memory while one
+                                     background thread fetches a new copy
+    empty   (never fetched)          fetched in the caller's thread; when
+                                     that fails, get() returns None and the
+                                     page falls back to its simulation
+
+A failed fetch never drops prices that were already cached, and is not
+retried for retry_interval seconds, so an unreachable API costs one
+timeout per interval instead of one per rerun.
+
+The page calls prefetch() with every crop it lists, so the prices of all
+crops are fetched together in the background and switching crops never
+waits on the network. CROP_PRICE_API_URL picks the API:
+
+    a URL without {code}   one request returns every crop (the default)
+    a URL with {code}      one request per crop, CROP_PRICE_WORKERS at a
+                           time (default 8)
+
+Requests share one pooled requests.Session with keep-alive. Refused or
+timed-out connections and 429/5xx answers are retried twice with
+backoff; a read timeout is not retried, since an API that accepted the
+request and went quiet will not answer a second time either. Every fetch
+also has an overall deadline (CROP_PRICE_DEADLINE, default 8 s), after
+which it returns the crops that have arrived, so a hung API costs at most
+that long in either mode. price_server.py is a local stand-in for either
+kind of API.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+PRICE_API_URL = os.environ.get("CROP_PRICE_API_URL", "https://mocki.io/v1/6ed6806c-3706-4bbe-85fa-e48cff273ef9")
+PRICE_TTL = float(os.environ.get("CROP_PRICE_TTL", 300))
+PRICE_WORKERS = int(os.environ.get("CROP_PRICE_WORKERS", 8))
+PRICE_DEADLINE = float(os.environ.get("CROP_PRICE_DEADLINE", 8))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def make_session(pool_size=PRICE_WORKERS, retries=2, backoff=0.3):
+    """requests.Session with keep-alive connections, one per worker, retrying
+    failed connections and 429/5xx answers but not read timeouts."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, connect=retries, status=retries, read=0, other=0, backoff_factor=backoff,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def price_session():
+    """The process-wide make_session()."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def _get_json(session, url, timeout):
+    response = session.get(url, timeout=timeout)
+    if response.status_code != 200:
+        raise ValueError(f"HTTP {response.status_code} from {url}")
+    return response.json()
+
+
+def _until(due, calls, max_workers):
+    # Results of calls, with None for any that failed or missed the deadline.
+    # Stragglers finish in the background, each bounded by its own timeout.
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price-fetch")
+    futures = [pool.submit(call) for call in calls]
+    done, _ = wait(futures, timeout=max(0.0, due - time.monotonic()))
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [future.result() if future in done and not future.exception() else None for future in futures]
+
+
+def fetch_prices(crops=None, url=PRICE_API_URL, timeout=5, max_workers=PRICE_WORKERS, session=None,
+                 deadline=PRICE_DEADLINE):
+    """Price records for crops ({name: API code}); raises when none could be fetched.
+
+    Per-crop requests run max_workers at a time. Crops whose request fails
+    are left out, so one bad crop does not cost the others their prices.
+    The whole fetch returns within deadline seconds.
+    """
+    session = session or price_session()
+    due = time.monotonic() + deadline
+
+    def get(url):
+        remaining = due - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Price fetch deadline passed before {url}")
+        return _get_json(session, url, min(timeout, remaining))
+
+    if "{code}" not in url:
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-fetch")
+        future = pool.submit(get, url)
+        pool.shutdown(wait=False)
+        try:
+            # Raises the request's own error, or TimeoutError at the deadline
+            records = future.result(timeout=max(0.0, due - time.monotonic())).get("crops")
+        except TimeoutError:
+            raise TimeoutError(f"No answer from {url} within the price fetch deadline")
+        if not records:
+            raise ValueError(f"No price data from {url}")
+        return records
+
+    def fetch_one(name, code):
+        # Indexed by the page's crop name, whatever the API calls it
+        return dict(get(url.format(code=code)), name=name)
+
+    calls = [lambda name=name, code=code: fetch_one(name, code) for name, code in (crops or {}).items()]
+    records = [record for record in _until(due, calls, max_workers) if record]
+    if not records:
+        raise ValueError(f"No price data from {url}")
+    return records
+
+
+def index_crops(crops):
+    # First entry wins, as the linear scan this replaces did
+    index = {}
+    for crop in crops:
+        index.setdefault(crop["name"].lower(), crop)
+    return index
+
+
+class PriceCache:
+    """Crop prices with a TTL and stale-while-revalidate refresh."""
+
+    def __init__(self, fetch=fetch_prices, ttl=PRICE_TTL, retry_interval=60.0):
+        self.fetch = fetch
+        self.crops = {}
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.fetch_count = 0
+        self.last_error = None
+        # _lock is held for a whole fetch; _refresh_lock only guards the
+        # flag, so starting a refresh never waits on a fetch in flight
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # (index, first crop), swapped as one reference so readers never
+        # see the index of one response with the first crop of another
+        self._data = None
+        self._fetched_at = None
+        self._refresh_due = 0.0
+        self._refreshing = False
+
+    def get(self, crop_name):
+        """The API record for crop_name (the first crop when it is not listed), or None."""
+        data = self._data
+        if data is None:
+            data = self._fetch_now()
+            if data is None:
+                return None
+        elif time.monotonic() >= self._refresh_due:
+            self._refresh_in_background()
+        index, first = data
+        # Crops the API does not list get its first crop, for demonstration
+        return index.get(crop_name.lower(), first)
+
+    def prefetch(self, crops):
+        """Fetch the prices of crops ({name: API code}) in the background
+        unless fresh ones are cached; never blocks."""
+        if set(crops) - set(self.crops):
+            self.crops = dict(self.crops, **crops)
+            self._refresh_due = 0.0
+        if time.monotonic() >= self._refresh_due:
+            self._refresh_in_background()
+
+    def _fetch_now(self):
+        # Sessions that arrive during the first fetch (or a prefetch) wait
+        # for it rather than each sending their own request
+        with self._lock:
+            if self._data is None and time.monotonic() >= self._refresh_due:
+                self._update()
+            return self._data
+
+    def _refresh_in_background(self):
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True, name="price-refresh").start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                # A caller may have fetched while this thread was starting
+                if time.monotonic() >= self._refresh_due:
+                    self._update()
+        finally:
+            self._refreshing = False
+
+    def _update(self):
+        # Called with the lock held
+        now = time.monotonic()
+        try:
+            crops = self.fetch(self.crops)
+        except Exception as e:
+            # Keep serving what we have and try again after retry_interval
+            self.last_error = str(e)
+            self._refresh_due = now + min(self.retry_interval, self.ttl)
+            return
+        self._data = (index_crops(crops), crops[0])
+        self._fetched_at = now
+        self._refresh_due = now + self.ttl
+        self.fetch_count += 1
+        self.last_error = None
+
+    def info(self):
+        data = self._data
+        age = time.monotonic() - self._fetched_at if self._fetched_at is not None else None
+        return {"crops": len(data[0]) if data else 0, "age_seconds": age, "ttl": self.ttl,
+                "fetch_count": self.fetch_count, "last_error": self.last_error}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_price_cache():
+    # One cache per process, shared by every Streamlit session
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PriceCache()
+        return _cache
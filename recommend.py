@@ -0,0 +1,141 @@
+"""Shared crop recommendation steps: input encoding, scoring and top-k."""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backends import backend_for
+
+
+# Order of the Soil Type selectbox; the model was trained on these indices
+SOIL_TYPES = ["Sandy", "Clay", "Loamy", "Peaty", "Silty", "Chalky"]
+
+
+def encode_soil_type(values):
+    # Accept integer codes as-is and map soil type names (any case) to codes
+    lookup = {name.lower(): code for code, name in enumerate(SOIL_TYPES)}
+
+    def encode(value):
+        if isinstance(value, str):
+            if value.strip().isdigit():
+                return int(value)
+            if value.strip().lower() not in lookup:
+                raise ValueError(f"Unknown soil type '{value}', expected one of {SOIL_TYPES}")
+            return lookup[value.strip().lower()]
+        return value
+
+    return [encode(v) for v in values]
+
+
+def feature_defaults(loaded):
+    """Training mean of every model feature, from the saved scaler."""
+    return dict(zip(loaded.features, (float(v) for v in loaded.scaler.mean_)))
+
+
+def build_input(values, features, defaults=None):
+    """Return a (1, n_features) row from a {feature: value} mapping.
+
+    Features missing from values are taken from defaults when given.
+    """
+    row = dict(defaults or {})
+    row.update(values)
+    if "soil_type" in row:
+        row["soil_type"] = encode_soil_type([row["soil_type"]])[0]
+    missing = [name for name in features if name not in row]
+    if missing:
+        raise ValueError(f"Missing input features: {', '.join(missing)}")
+    return np.array([[row[name] for name in features]], dtype=np.float64)
+
+
+def top_k(probabilities, k=3):
+    """Top-k class indices and probabilities for every row, best first.
+
+    One argpartition over the whole (rows, classes) matrix picks the k best
+    columns per row; only those k columns are then sorted.
+    """
+    probabilities = np.asarray(probabilities)
+    k = min(k, probabilities.shape[1])
+    part = np.argpartition(probabilities, -k, axis=1)[:, -k:]
+    part_probs = np.take_along_axis(probabilities, part, axis=1)
+    order = np.argsort(-part_probs, axis=1)
+    indices = np.take_along_axis(part, order, axis=1)
+    return indices, np.take_along_axis(part_probs, order, axis=1)
+
+
+def predict_proba(loaded, X):
+    # loaded is a model_store.LoadedModel snapshot; the backend is picked
+    # per batch size by a one-off benchmark (see backends.py)
+    X = loaded.scaler.transform(X)
+    return backend_for(loaded, len(X)).predict_proba(X)
+
+
+def recommend(loaded, X, k=3):
+    """Return (crop names, probabilities), both shaped (rows, k)."""
+    indices, probs = top_k(predict_proba(loaded, X), k)
+    crops = loaded.le.classes_[indices]
+    return crops, probs
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded to maxsize entries, with hit stats."""
+
+    def __init__(self, maxsize=10_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+# Shared by every session in the process. Form inputs are mostly integer
+# sliders, so identical vectors come up again and again.
+RECOMMENDATION_CACHE = LRUCache(int(os.environ.get("CROP_CACHE_SIZE", "10000")))
+
+
+def cache_key(loaded, row, k):
+    # The model version is part of the key, so a hot reload never serves
+    # results of the previous model
+    return (loaded.version, k) + tuple(float(v) for v in np.ravel(row))
+
+
+def recommend_one(loaded, row, k=3, cache=RECOMMENDATION_CACHE):
+    """Top-k (crops, probabilities) tuples for one unscaled input row, memoized."""
+    key = cache_key(loaded, row, k)
+    result = cache.get(key)
+    if result is None:
+        crops, probs = recommend(loaded, np.asarray(row, dtype=np.float64).reshape(1, -1), k)
+        result = (tuple(str(c) for c in crops[0]), tuple(float(p) for p in probs[0]))
+        cache.put(key, result)
+    return result
@@ -0,0 +1,191 @@
+"""Class-imbalance handling for the training set.
+
+    smotetomek    imblearn's SMOTETomek (SMOTE, then remove Tomek links)
+    smote         SMOTE only: one parallel neighbour search per minority
+                  class, synthetic rows interpolated in fixed-size chunks
+    class_weight  no resampling; balanced per-row weights for the fit
+    none          train on the rows as they are
+
+The Tomek-links pass of SMOTETomek searches neighbours over the whole
+resampled set and becomes the slowest step on large datasets; ``smote``
+skips it and ``class_weight`` skips resampling entirely.
+
+    python resampling.py --bench --scale 20   # time, memory and accuracy
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+
+METHODS = ("smotetomek", "smote", "class_weight", "none")
+CHUNK_SIZE = 50_000
+
+
+def smote(X, y, k_neighbors=5, n_jobs=None, chunk_size=CHUNK_SIZE, seed=42):
+    """Oversample every class up to the largest one by SMOTE interpolation.
+
+    All random draws are made up front, so the output does not depend on
+    chunk_size; only the interpolated rows are built chunk by chunk.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    rng = np.random.default_rng(seed)
+    classes, counts = np.unique(y, return_counts=True)
+    target = counts.max()
+    n_new = int((target - counts).sum())
+    X_out = np.empty((len(X) + n_new, X.shape[1]), dtype=X.dtype)
+    y_out = np.empty(len(y) + n_new, dtype=y.dtype)
+    X_out[:len(X)] = X
+    y_out[:len(y)] = y
+
+    pos = len(X)
+    for cls, count in zip(classes, counts):
+        n_synthetic = target - count
+        if n_synthetic == 0:
+            continue
+        X_class = X[y == cls]
+        k = min(k_neighbors, count - 1)
+        if k < 1:
+            # A single row has no neighbours to interpolate towards
+            X_out[pos:pos + n_synthetic] = X_class[0]
+            y_out[pos:pos + n_synthetic] = cls
+            pos += n_synthetic
+            continue
+        # First neighbour of every row is the row itself
+        neighbors = NearestNeighbors(n_neighbors=k + 1, n_jobs=n_jobs).fit(X_class)
+        neighbor_idx = neighbors.kneighbors(X_class, return_distance=False)[:, 1:]
+
+        base = rng.integers(0, count, n_synthetic)
+        pick = neighbor_idx[base, rng.integers(0, k, n_synthetic)]
+        gap = rng.random(n_synthetic, dtype=np.float64)
+        for start in range(0, n_synthetic, chunk_size):
+            stop = min(start + chunk_size, n_synthetic)
+            a = X_class[base[start:stop]]
+            b = X_class[pick[start:stop]]
+            X_out[pos + start:pos + stop] = a + gap[start:stop, None] * (b - a)
+        y_out[pos:pos + n_synthetic] = cls
+        pos += n_synthetic
+    return X_out, y_out
+
+
+def balanced_weights(y):
+    """Per-row weights n / (classes * class count), as class_weight='balanced'."""
+    classes, inverse, counts = np.unique(y, return_inverse=True, return_counts=True)
+    return (len(y) / (len(classes) * counts))[inverse]
+
+
+def resample(method, X, y, seed=42, n_jobs=None, chunk_size=CHUNK_SIZE):
+    """Return (X, y, sample_weight); sample_weight is None unless class_weight."""
+    if method == "smotetomek":
+        from imblearn.combine import SMOTETomek
+
+        X_res, y_res = SMOTETomek(random_state=seed, n_jobs=n_jobs).fit_resample(X, y)
+        return X_res, y_res, None
+    if method == "smote":
+        X_res, y_res = smote(X, y, n_jobs=n_jobs, chunk_size=chunk_size, seed=seed)
+        return X_res, y_res, None
+    if method == "class_weight":
+        return X, y, balanced_weights(y)
+    if method == "none":
+        return X, y, None
+    raise ValueError(f"Unknown resampling method '{method}', expected one of {METHODS}")
+
+
+def cache_params(method, seed):
+    # What the resample stage output depends on (not n_jobs or chunk_size)
+    params = {"method": method, "seed": seed}
+    if method == "smotetomek":
+        import imblearn
+        params["imblearn"] = imblearn.__version__
+    return params
+
+
+def imbalanced_sample(X, y, ratio=10, scale=1, noise=0.01, seed=0):
+    """Benchmark data: classes thinned from 1 down to 1/ratio of their rows,
+    then tiled scale times with a little noise so no two rows coincide."""
+    rng = np.random.default_rng(seed)
+    classes = np.unique(y)
+    keep = np.geomspace(1.0, 1.0 / ratio, len(classes))
+    rows = np.concatenate([
+        rng.permutation(np.flatnonzero(y == cls))[:max(2, int(round(share * (y == cls).sum())))]
+        for cls, share in zip(classes, keep)
+    ])
+    X, y = np.tile(X[rows], (scale, 1)), np.tile(y[rows], scale)
+    return X + rng.normal(0.0, noise, X.shape), y
+
+
+def benchmark(X_train, y_train, X_test, y_test, methods=METHODS, n_jobs=None, seed=42):
+    """{method: time, peak traced memory, rows and test accuracy}.
+
+    The test rows keep the original balanced classes, so accuracy is also
+    the mean per-class recall.
+    """
+    from xgboost import XGBClassifier
+
+    # Import up front so the first method timed does not pay for it
+    import imblearn.combine  # noqa: F401
+    import sklearn.neighbors  # noqa: F401
+
+    results = {}
+    for method in methods:
+        tracemalloc.start()
+        start = time.perf_counter()
+        X_res, y_res, weights = resample(method, X_train, y_train, seed=seed, n_jobs=n_jobs)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        model = XGBClassifier(tree_method='hist', n_estimators=200, learning_rate=0.1, max_depth=6,
+                              n_jobs=n_jobs, random_state=seed)
+        start = time.perf_counter()
+        model.fit(X_res, y_res, sample_weight=weights)
+        fit_seconds = time.perf_counter() - start
+        predictions = model.predict(X_test)
+        results[method] = {
+            "seconds": seconds,
+            "peak_mb": peak / 2**20,
+            "rows": int(len(y_res)),
+            "fit_seconds": fit_seconds,
+            "accuracy": float((predictions == y_test).mean()),
+        }
+    return results
+
+
+def main(argv=None):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    from artifacts import DEFAULT_FEATURES
+    from dataset import DATASET_PATH, load_dataset
+
+    parser = argparse.ArgumentParser(description="Compare class-imbalance handling methods")
+    parser.add_argument("--bench", action="store_true", help="run the benchmark")
+    parser.add_argument("--data", default=DATASET_PATH)
+    parser.add_argument("--ratio", type=float, default=10, help="largest / smallest class size")
+    parser.add_argument("--scale", type=int, default=1, help="tile the training rows this many times")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return
+
+    df = load_dataset(args.data, columns=DEFAULT_FEATURES + ['label'])
+    X = StandardScaler().fit_transform(df[DEFAULT_FEATURES].to_numpy(dtype=np.float64))
+    y = LabelEncoder().fit_transform(df['label'].astype(str))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=args.seed)
+    X_train, y_train = imbalanced_sample(X_train, y_train, ratio=args.ratio, scale=args.scale, seed=args.seed)
+
+    print(f"{len(y_train)} training rows, class sizes {np.bincount(y_train).min()}-{np.bincount(y_train).max()}")
+    print(f"{'method':<14}{'resample s':>11}{'peak MB':>9}{'rows':>9}{'fit s':>8}{'accuracy':>10}")
+    results = benchmark(X_train, y_train, X_test, y_test, args.methods, args.n_jobs, args.seed)
+    for method, r in results.items():
+        print(f"{method:<14}{r['seconds']:>11.2f}{r['peak_mb']:>9.1f}{r['rows']:>9}{r['fit_seconds']:>8.2f}"
+              f"{r['accuracy']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Monte Carlo profit risk for the profitability calculator.
+
+The calculator's profit is a point estimate: the low end of the yield
+range, today's price and the entered costs. Risk mode draws joint samples
+of the three instead:
+
+    yield   uniform over the crop's "Expected Yield" range (e.g. 3-4 tons/ha)
+    price   lognormal around the entered price, with the monthly volatility
+            of the crop's simulated price history scaled to the months
+            until the crop is sold
+    costs   each entered cost times an independent normal factor (mean 1,
+            sd cost_uncertainty, floored at 0)
+
+and prices every sample with the same arithmetic as
+market.profit_summary. Samples are drawn in chunks until the requested
+count is reached or the time budget runs out, so a rerun stays
+interactive; the result reports how many samples it used.
+"""
+import re
+import time
+
+import numpy as np
+
+from market import PROCESSING_OPTIONS, STORAGE_OPTIONS, yield_quintals_per_acre
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_SIZE = 20_000
+
+
+def yield_range(text):
+    """(low, high) from an "Expected Yield" string such as "1.5-2.5 tons/ha"."""
+    numbers = [float(n) for n in re.findall(r"\d+(?:\.\d+)?", text)]
+    if not numbers:
+        raise ValueError(f"No yield figures in '{text}'")
+    return min(numbers[:2]), max(numbers[:2])
+
+
+def monthly_volatility(price_history):
+    """Standard deviation of the monthly log price changes."""
+    prices = np.asarray(price_history, dtype=np.float64)
+    return float(np.diff(np.log(np.clip(prices, 1, None))).std(ddof=1))
+
+
+class RiskResult:
+    def __init__(self, profit, cost, requested, seconds):
+        self.profit = profit
+        self.cost = cost
+        self.requested = requested
+        self.seconds = seconds
+
+    @property
+    def samples(self):
+        return len(self.profit)
+
+    def percentiles(self, q=PERCENTILES):
+        return dict(zip(q, np.percentile(self.profit, q)))
+
+    def summary(self, level=0.95):
+        """Mean, probability of loss, value-at-risk and expected shortfall at level.
+
+        Value-at-risk is the loss not exceeded with probability level (0 when
+        even that tail makes a profit); expected shortfall is the mean loss
+        in the worst 1 - level of samples.
+        """
+        cutoff = np.percentile(self.profit, 100 * (1 - level))
+        tail = self.profit[self.profit <= cutoff]
+        return {
+            "mean": float(self.profit.mean()),
+            "std": float(self.profit.std()),
+            "probability_of_loss": float((self.profit < 0).mean()),
+            "value_at_risk": float(max(0.0, -cutoff)),
+            "expected_shortfall": float(max(0.0, -tail.mean())),
+            "mean_roi": float((self.profit / self.cost).mean() * 100),
+        }
+
+
+def simulate_profit(rng, market_price, yield_low, yield_high, land_area_acre, costs_per_acre, volatility,
+                    months_to_sale=4, cost_uncertainty=0.1, quality_premium=0, organic_premium=0,
+                    storage_option="Sell Immediately", processing_option="No Processing",
+                    samples=100_000, time_budget=0.25, chunk_size=CHUNK_SIZE):
+    """RiskResult of up to samples draws, stopping early after time_budget seconds."""
+    start = time.perf_counter()
+    storage_cost, storage_benefit, _ = STORAGE_OPTIONS[storage_option]
+    processing_cost, processing_benefit, _ = PROCESSING_OPTIONS[processing_option]
+    # Everything that scales the market price, as in profit_summary
+    price_factor = ((1 + quality_premium / 100) * (1 + organic_premium / 100)
+                    * (1 + storage_benefit) * (1 + processing_benefit))
+    costs = np.asarray(costs_per_acre, dtype=np.float64)
+    sigma = volatility * np.sqrt(months_to_sale)
+
+    profits, total_costs = [], []
+    drawn = 0
+    while drawn < samples:
+        n = min(chunk_size, samples - drawn)
+        yields = rng.uniform(yield_low, yield_high, n)
+        # Mean-preserving lognormal: the entered price stays the expectation
+        prices = market_price * np.exp(sigma * rng.standard_normal(n) - sigma ** 2 / 2)
+        factors = np.clip(1 + cost_uncertainty * rng.standard_normal((n, len(costs))), 0, None)
+
+        revenue = prices * price_factor * yield_quintals_per_acre(yields) * land_area_acre
+        cost = (factors @ costs + storage_cost + processing_cost) * land_area_acre
+        profits.append(revenue - cost)
+        total_costs.append(cost)
+        drawn += n
+        if time.perf_counter() - start > time_budget:
+            break
+    return RiskResult(np.concatenate(profits), np.concatenate(total_costs), samples, time.perf_counter() - start)
@@ -0,0 +1,258 @@
+"""Headless HTTP service for crop recommendations.
+
+Plain WSGI so it runs under gunicorn without a web framework::
+
+    gunicorn -k gthread --threads 32 -w 2 -b 0.0.0.0:8000 service:app
+
+or, for local use, ``python service.py --port 8000``.
+
+Endpoints
+    POST /recommend        one field as a JSON object, e.g.
+                           {"N": 90, "P": 42, ..., "soil_type": "Loamy", "k": 3}
+    POST /recommend/batch  {"rows": [{...}, ...], "k": 3}
+    GET  /health           model version and load info
+    GET  /metrics          latency and batch-size histograms (Prometheus text)
+
+Concurrent /recommend calls are micro-batched: requests arriving within
+``BATCH_WAIT`` seconds of each other share one predict_proba call.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from backends import describe
+from metrics import REGISTRY
+from model_store import get_model_holder
+from recommend import RECOMMENDATION_CACHE, build_input, cache_key, predict_proba, top_k
+
+
+BATCH_WAIT = float(os.environ.get("CROP_BATCH_WAIT", "0.005"))
+MAX_BATCH = int(os.environ.get("CROP_MAX_BATCH", "128"))
+MAX_BULK_ROWS = 100_000
+
+REQUEST_LATENCY = REGISTRY.histogram("crop_request_seconds", "End-to-end request latency", labels=("endpoint",))
+QUEUE_WAIT = REGISTRY.histogram("crop_batch_queue_seconds", "Time a row waited for its micro-batch")
+PREDICT_LATENCY = REGISTRY.histogram("crop_predict_seconds", "Time of one scaler + predict_proba call",
+                                     labels=("path",))
+BATCH_SIZE = REGISTRY.histogram("crop_batch_rows", "Rows per predict_proba call", labels=("path",),
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536))
+
+
+class MicroBatcher:
+    """Groups single rows submitted from many threads into one model call.
+
+    A worker thread takes the first waiting row, keeps collecting for at most
+    max_wait seconds or until max_batch rows, then scores them together.
+    Each caller gets a Future resolving to (loaded model snapshot, proba row).
+    """
+
+    def __init__(self, holder, max_batch=MAX_BATCH, max_wait=BATCH_WAIT):
+        self.holder = holder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so each gunicorn worker gets its own thread after fork
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="crop-microbatcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, row):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((row, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            for _, _, queued_at in batch:
+                QUEUE_WAIT.observe(start - queued_at)
+            try:
+                loaded = self.holder.get()
+                probabilities = predict_proba(loaded, np.vstack([row for row, _, _ in batch]))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            PREDICT_LATENCY.observe(time.perf_counter() - start, "microbatch")
+            BATCH_SIZE.observe(len(batch), "microbatch")
+            for (_, future, _), row_probs in zip(batch, probabilities):
+                future.set_result((loaded, row_probs))
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _parse_k(payload):
+    try:
+        k = int(payload.get("k", 3))
+    except (TypeError, ValueError):
+        raise BadRequest("'k' must be an integer")
+    if k < 1:
+        raise BadRequest("'k' must be at least 1")
+    return k
+
+
+def _row_from(payload, features):
+    if not isinstance(payload, dict):
+        raise BadRequest("Each field must be a JSON object")
+    try:
+        row = build_input({name: payload[name] for name in features if name in payload}, features)[0]
+    except (ValueError, TypeError) as e:
+        raise BadRequest(str(e))
+    # null, NaN and Infinity parse to floats the model would treat as missing
+    bad = [name for name, value in zip(features, row) if not np.isfinite(value)]
+    if bad:
+        raise BadRequest(f"Features must be finite numbers: {', '.join(bad)}")
+    return row
+
+
+def _format(loaded, indices, probs):
+    return [{"crop": str(crop), "probability": float(prob)}
+            for crop, prob in zip(loaded.le.classes_[indices], probs)]
+
+
+class RecommendationService:
+    def __init__(self, holder=None, batcher=None):
+        self.holder = holder or get_model_holder()
+        self.batcher = batcher or MicroBatcher(self.holder)
+
+    def recommend(self, payload):
+        loaded = self.holder.get()
+        row = _row_from(payload, loaded.features)
+        k = _parse_k(payload)
+
+        # Same (crops, probabilities) entries as recommend.recommend_one
+        result = RECOMMENDATION_CACHE.get(cache_key(loaded, row, k))
+        if result is None:
+            loaded, probabilities = self.batcher.submit(row).result()
+            indices, probs = top_k(probabilities[None, :], k)
+            result = (tuple(str(c) for c in loaded.le.classes_[indices[0]]), tuple(float(p) for p in probs[0]))
+            RECOMMENDATION_CACHE.put(cache_key(loaded, row, k), result)
+        crops, probs = result
+        return {"model_version": loaded.version,
+                "recommendations": [{"crop": crop, "probability": prob} for crop, prob in zip(crops, probs)]}
+
+    def recommend_batch(self, payload):
+        if not isinstance(payload, dict) or not isinstance(payload.get("rows"), list):
+            raise BadRequest("Expected {\"rows\": [...]}")
+        rows = payload["rows"]
+        if not rows:
+            raise BadRequest("'rows' is empty")
+        if len(rows) > MAX_BULK_ROWS:
+            raise BadRequest(f"At most {MAX_BULK_ROWS} rows per request")
+        k = _parse_k(payload)
+
+        # Bulk requests are already batched; score them in one call directly
+        loaded = self.holder.get()
+        X = np.vstack([_row_from(row, loaded.features) for row in rows])
+        start = time.perf_counter()
+        indices, probs = top_k(predict_proba(loaded, X), k)
+        PREDICT_LATENCY.observe(time.perf_counter() - start, "bulk")
+        BATCH_SIZE.observe(len(rows), "bulk")
+        return {"model_version": loaded.version,
+                "results": [_format(loaded, i, p) for i, p in zip(indices, probs)]}
+
+    def health(self):
+        return {"status": "ok", "model": self.holder.info(), "backends": describe(self.holder.get()),
+                "cache": RECOMMENDATION_CACHE.stats()}
+
+
+_JSON = "application/json"
+
+
+def make_app(service=None):
+    service = service or RecommendationService()
+
+    routes = {
+        ("POST", "/recommend"): service.recommend,
+        ("POST", "/recommend/batch"): service.recommend_batch,
+        ("GET", "/health"): lambda _: service.health(),
+    }
+
+    def app(environ, start_response):
+        start = time.perf_counter()
+        method, path = environ["REQUEST_METHOD"], environ.get("PATH_INFO", "/").rstrip("/") or "/"
+
+        if method == "GET" and path == "/metrics":
+            body = REGISTRY.render().encode()
+            start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4"),
+                                      ("Content-Length", str(len(body)))])
+            return [body]
+
+        handler = routes.get((method, path))
+        if handler is None:
+            status, result = "404 Not Found", {"error": f"No route for {method} {path}"}
+        else:
+            try:
+                payload = None
+                if method == "POST":
+                    length = int(environ.get("CONTENT_LENGTH") or 0)
+                    try:
+                        payload = json.loads(environ["wsgi.input"].read(length) or b"null")
+                    except ValueError:
+                        raise BadRequest("Request body is not valid JSON")
+                status, result = "200 OK", handler(payload)
+            except BadRequest as e:
+                status, result = "400 Bad Request", {"error": str(e)}
+            except Exception as e:
+                status, result = "500 Internal Server Error", {"error": str(e)}
+
+        body = json.dumps(result).encode()
+        start_response(status, [("Content-Type", _JSON), ("Content-Length", str(len(body)))])
+        REQUEST_LATENCY.observe(time.perf_counter() - start, path if handler else "unknown")
+        return [body]
+
+    return app
+
+
+app = make_app()
+
+
+if __name__ == "__main__":
+    from socketserver import ThreadingMixIn
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+    class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    parser = argparse.ArgumentParser(description="Serve crop recommendations over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    print(f"Serving crop recommendations on http://{args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,123 @@
+"""Strategy optimizer for the profitability tab.
+
+Every combination of storage, processing and marketing channel is priced
+under a grid of quality premiums, organic premiums and market prices in
+one NumPy broadcast, instead of one rerun per combination clicked by hand.
+The arithmetic is the same as market.profit_summary, with the channel's
+price factor applied on top; the wholesale channel (factor 1.0) matches
+profit_summary exactly.
+
+The grids always contain the values the user entered, so the result at
+those values is exact, and the ranked table also shows how each strategy
+holds up across the rest of the grid (mean and worst-case profit).
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from market import CHANNEL_PRICE_FACTORS, PROCESSING_OPTIONS, STORAGE_OPTIONS, yield_quintals_per_acre
+
+
+# Decision axes first, then scenario axes
+AXES = ("storage", "processing", "channel", "quality_premium", "organic_premium", "market_price")
+
+
+def scenario_grid(value, grid):
+    """grid with value added, sorted; the index of value in it."""
+    values = np.union1d(np.asarray(grid, dtype=np.float64), [float(value)])
+    return values, int(np.searchsorted(values, float(value)))
+
+
+class StrategyGrid:
+    def __init__(self, axes, revenue, cost, at, seconds, price_range):
+        # axes: name -> labels (decisions) or values (scenarios), in AXES order
+        self.axes = axes
+        # Shaped (storage, processing, channel, quality, organic, price)
+        self.revenue = revenue
+        self.cost = cost
+        self.profit = revenue - cost
+        self.roi = np.divide(self.profit * 100, cost, out=np.zeros_like(self.profit), where=cost > 0)
+        # Index of the user's own scenario on the three scenario axes
+        self.at = at
+        self.seconds = seconds
+        # Market prices span +-price_range around the entered price
+        self.price_range = price_range
+
+    @property
+    def scenarios(self):
+        return int(self.profit.size)
+
+    @property
+    def strategies(self):
+        return int(np.prod(self.profit.shape[:3]))
+
+    def _at(self, values):
+        return values[(slice(None),) * 3 + tuple(self.at)]
+
+    def _strategy(self, flat_index, metric):
+        s, p, c = np.unravel_index(flat_index, self.profit.shape[:3])
+        return {"storage": self.axes["storage"][s], "processing": self.axes["processing"][p],
+                "channel": self.axes["channel"][c], "profit": float(self._at(self.profit)[s, p, c]),
+                "roi": float(self._at(self.roi)[s, p, c]), "metric": metric}
+
+    def best(self, metric="profit"):
+        """Strategy with the highest profit or ROI at the user's own scenario."""
+        values = self._at(self.profit if metric == "profit" else self.roi)
+        return self._strategy(int(values.argmax()), metric)
+
+    def ranked(self, by="profit"):
+        """One row per strategy, best first, with its results at the user's
+        scenario and its mean and worst-case profit over the whole grid."""
+        flat = self.profit.reshape(self.profit.shape[:3] + (-1,))
+        s, p, c = (index.ravel() for index in np.indices(self.profit.shape[:3]))
+        table = pd.DataFrame({
+            "Storage": np.asarray(self.axes["storage"])[s],
+            "Processing": np.asarray(self.axes["processing"])[p],
+            "Channel": np.asarray(self.axes["channel"])[c],
+            "Revenue": self._at(self.revenue).ravel(),
+            "Cost": self._at(self.cost).ravel(),
+            "Profit": self._at(self.profit).ravel(),
+            "ROI (%)": self._at(self.roi).ravel(),
+            "Mean Profit (grid)": flat.mean(axis=-1).ravel(),
+            "Worst Profit (grid)": flat.min(axis=-1).ravel(),
+        })
+        column = {"profit": "Profit", "roi": "ROI (%)", "mean": "Mean Profit (grid)",
+                  "worst": "Worst Profit (grid)"}[by]
+        return table.sort_values(column, ascending=False, ignore_index=True)
+
+
+def optimize(market_price, expected_yield_t_ha, land_area_acre, cost_per_acre, quality_premium=0,
+             organic_premium=0, price_range=0.2, price_steps=9,
+             quality_grid=range(-10, 31, 5), organic_grid=(0, 10, 20, 30, 40, 50)):
+    """StrategyGrid of every storage x processing x channel strategy over
+    the premium grids and market prices within +-price_range."""
+    start = time.perf_counter()
+    prices, price_at = scenario_grid(market_price, market_price * np.linspace(1 - price_range, 1 + price_range,
+                                                                              price_steps))
+    quality, quality_at = scenario_grid(quality_premium, quality_grid)
+    organic, organic_at = scenario_grid(organic_premium, organic_grid)
+
+    def axis(values, position):
+        # values laid along one of the six dimensions
+        shape = [1] * len(AXES)
+        shape[position] = -1
+        return np.asarray(values, dtype=np.float64).reshape(shape)
+
+    storage_cost, storage_benefit = (axis([option[i] for option in STORAGE_OPTIONS.values()], 0) for i in (0, 1))
+    processing_cost, processing_benefit = (axis([option[i] for option in PROCESSING_OPTIONS.values()], 1)
+                                           for i in (0, 1))
+    channel_factor = axis(list(CHANNEL_PRICE_FACTORS.values()), 2)
+
+    price = (axis(prices, 5) * (1 + axis(quality, 3) / 100) * (1 + axis(organic, 4) / 100)
+             * (1 + storage_benefit) * (1 + processing_benefit) * channel_factor)
+    revenue = price * yield_quintals_per_acre(expected_yield_t_ha) * land_area_acre
+    cost = (cost_per_acre + storage_cost + processing_cost) * land_area_acre
+    # cost does not vary with the scenario axes; broadcast it to the full grid
+    revenue, cost = np.broadcast_arrays(revenue, cost)
+
+    axes = {"storage": list(STORAGE_OPTIONS), "processing": list(PROCESSING_OPTIONS),
+            "channel": list(CHANNEL_PRICE_FACTORS), "quality_premium": quality, "organic_premium": organic,
+            "market_price": prices}
+    return StrategyGrid(axes, revenue, np.ascontiguousarray(cost), (quality_at, organic_at, price_at),
+                        time.perf_counter() - start, price_range)
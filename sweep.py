@@ -0,0 +1,94 @@
+"""What-if sweeps: how crop probabilities change as one or two inputs vary.
+
+The full grid of input vectors is built with NumPy and scored in one batch,
+instead of one form submit and one predict_proba per point.
+"""
+import time
+
+import numpy as np
+
+from recommend import predict_proba
+
+
+# Same bounds as the Crop Recommendation form
+FEATURE_RANGES = {
+    "N": (0, 150),
+    "P": (0, 150),
+    "K": (0, 150),
+    "temperature": (0, 50),
+    "humidity": (0, 100),
+    "ph": (0.0, 14.0),
+    "rainfall": (0, 500),
+    "soil_moisture": (0, 100),
+    "sunlight_exposure": (0, 12),
+}
+
+FEATURE_LABELS = {
+    "N": "Nitrogen (N)",
+    "P": "Phosphorus (P)",
+    "K": "Potassium (K)",
+    "temperature": "Temperature (°C)",
+    "humidity": "Humidity (%)",
+    "ph": "Soil pH",
+    "rainfall": "Rainfall (mm)",
+    "soil_moisture": "Soil Moisture (%)",
+    "sunlight_exposure": "Sunlight Exposure (hours/day)",
+}
+
+
+def axis_values(feature, steps):
+    low, high = FEATURE_RANGES[feature]
+    return np.linspace(low, high, steps)
+
+
+def build_grid(base_row, features, sweep_features, steps):
+    """Copies of base_row with sweep_features set to every grid combination.
+
+    Returns (X, axes): X has one row per grid point in C order of the axes.
+    """
+    axes = [axis_values(name, steps) for name in sweep_features]
+    mesh = np.meshgrid(*axes, indexing="ij")
+    X = np.tile(np.asarray(base_row, dtype=np.float64).reshape(1, -1), (mesh[0].size, 1))
+    for name, values in zip(sweep_features, mesh):
+        X[:, features.index(name)] = values.ravel()
+    return X, axes
+
+
+class SweepResult:
+    def __init__(self, sweep_features, axes, probabilities, classes, seconds):
+        self.sweep_features = sweep_features
+        self.axes = axes
+        # Shaped (*grid, classes)
+        self.probabilities = probabilities
+        self.classes = classes
+        self.seconds = seconds
+
+    @property
+    def points(self):
+        return int(np.prod([len(axis) for axis in self.axes]))
+
+    def top_crops(self, n=5):
+        # Crops that are most likely anywhere on the grid
+        peak = self.probabilities.reshape(-1, len(self.classes)).max(axis=0)
+        return [str(self.classes[i]) for i in np.argsort(-peak)[:n]]
+
+    def crop_probabilities(self, crop):
+        return self.probabilities[..., list(self.classes).index(crop)]
+
+    def best_crop(self):
+        return self.classes[self.probabilities.argmax(axis=-1)]
+
+
+def run_sweep(loaded, base_row, sweep_features, steps=51):
+    if not 1 <= len(sweep_features) <= 2:
+        raise ValueError("Sweep one or two features")
+    unknown = [name for name in sweep_features if name not in FEATURE_RANGES]
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    X, axes = build_grid(base_row, loaded.features, sweep_features, steps)
+    probabilities = predict_proba(loaded, X)
+    shape = tuple(len(axis) for axis in axes) + (probabilities.shape[1],)
+    return SweepResult(list(sweep_features), axes, probabilities.reshape(shape),
+                       loaded.le.classes_, time.perf_counter() - start)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from artifacts import ARTIFACT_DIR
+from backends import BACKENDS, TOLERANCE, build_backends
+from model_store import PICKLE_PATH, load_model_file
+
+
+@pytest.fixture(scope="module", params=[ARTIFACT_DIR, PICKLE_PATH])
+def model(request):
+    model, le, scaler, manifest = load_model_file(request.param)
+    return model
+
+
+@pytest.fixture(scope="module")
+def rows(model):
+    # Scaled feature space, with a few rows far outside the training range
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((300, model.get_booster().num_features())).astype(np.float32)
+    X[:20] *= 10
+    return X
+
+
+@pytest.mark.parametrize("name", [name for name in BACKENDS if name != "booster"])
+def test_backends_match_the_booster(model, rows, name):
+    backends, errors = build_backends(model, ["booster", name])
+    if name not in backends:
+        if name == "onnx":
+            pytest.skip(errors[name])
+        pytest.fail(errors[name])
+    expected = backends["booster"].predict_proba(rows)
+    for size in (1, 7, len(rows)):
+        np.testing.assert_allclose(backends[name].predict_proba(rows[:size]), expected[:size], rtol=0,
+                                   atol=TOLERANCE)
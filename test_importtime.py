@@ -0,0 +1,30 @@
+import pytest
+
+import importtime
+
+
+@pytest.fixture(scope="module")
+def runs():
+    # Fastest of two cold runs per page, to damp scheduler noise
+    results = {}
+    for page in importtime.PAGES:
+        totals, modules = zip(*(importtime.page_imports(page) for _ in range(2)))
+        results[page] = min(totals), modules[-1]
+    return results
+
+
+def test_home_skips_other_pages_libraries(runs):
+    total, modules = runs["Home"]
+    assert importtime.home_excluded_imports(modules) == []
+
+
+@pytest.mark.parametrize("page", importtime.PAGES)
+def test_no_page_loads_unused_modules(runs, page):
+    total, modules = runs[page]
+    assert importtime.unused_imports(modules) == []
+
+
+def test_home_import_time_budget(runs):
+    home, _ = runs["Home"]
+    crop, _ = runs["Crop Recommendation"]
+    assert home <= importtime.HOME_BUDGET * crop, f"Home {home:.0f} ms, Crop Recommendation {crop:.0f} ms"
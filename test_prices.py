@@ -0,0 +1,117 @@
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import urlopen
+
+import pytest
+import requests
+
+from market import MARKET_CROPS
+from price_server import make_server, price_record
+from prices import PriceCache, fetch_prices, make_session
+
+
+CROPS = {name: name.upper() for name in MARKET_CROPS}
+
+
+def slow_fetch(delay, started=None):
+    def fetch(crops):
+        if started is not None:
+            started.set()
+        time.sleep(delay)
+        return [{"name": "Wheat", "modal_price": "2500"}]
+    return fetch
+
+
+def test_stale_reads_do_not_wait_for_the_refresh():
+    cache = PriceCache(fetch=slow_fetch(0.0), ttl=0.05)
+    assert cache.get("Wheat")["modal_price"] == "2500"
+
+    started = threading.Event()
+    cache.fetch = slow_fetch(1.0, started)
+    time.sleep(0.1)
+    # The first stale read starts the refresh, the second arrives while it runs
+    for _ in range(2):
+        start = time.perf_counter()
+        assert cache.get("Wheat")["modal_price"] == "2500"
+        assert time.perf_counter() - start < 0.2
+        started.wait(1)
+
+
+def test_failed_fetch_keeps_serving_cached_prices():
+    cache = PriceCache(fetch=slow_fetch(0.0), ttl=0.05, retry_interval=60)
+    cache.get("Wheat")
+
+    def failing(crops):
+        raise ValueError("API down")
+
+    cache.fetch = failing
+    time.sleep(0.1)
+    assert cache.get("Wheat")["modal_price"] == "2500"
+    deadline = time.monotonic() + 2
+    while cache.last_error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.last_error == "API down"
+    assert cache.get("Wheat")["modal_price"] == "2500"
+
+
+@contextmanager
+def serving(**options):
+    server = make_server(port=0, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield base
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def stats(base):
+    with urlopen(base + "/stats") as response:
+        return json.load(response)
+
+
+def test_per_crop_fetch_retries_and_skips_failing_crops():
+    # Every path fails once, and Rice always fails
+    with serving(fail_first=1, fail_codes=["RICE"]) as base:
+        records = fetch_prices(CROPS, url=base + "/prices/{code}", session=make_session(backoff=0))
+        served = stats(base)
+    assert sorted(record["name"] for record in records) == sorted(set(CROPS) - {"Rice"})
+    assert all(record["modal_price"] == price_record(CROPS[record["name"]])["modal_price"] for record in records)
+    # One retry per crop; Rice gives up after the two retries
+    paths = served["paths"]
+    assert paths.pop("/prices/RICE") == 3
+    assert set(paths.values()) == {2}
+
+
+def test_price_cache_over_the_stand_in_server():
+    with serving(fail_first=1) as base:
+        session = make_session(backoff=0)
+        cache = PriceCache(fetch=lambda crops: fetch_prices(crops, url=base + "/prices", session=session))
+        assert cache.get("Wheat") == price_record("WHEAT", "Wheat")
+        assert cache.fetch_count == 1
+
+
+def test_a_hung_api_costs_one_timeout():
+    # Accepts connections and never answers
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(32)
+    url = f"http://127.0.0.1:{listener.getsockname()[1]}"
+    try:
+        start = time.perf_counter()
+        with pytest.raises(requests.RequestException):
+            fetch_prices(url=url + "/prices", timeout=0.3, session=make_session())
+        assert time.perf_counter() - start < 0.6
+
+        # Per crop: 17 crops on 2 workers would take 9 timeouts; the deadline stops it
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            fetch_prices(CROPS, url=url + "/prices/{code}", timeout=0.3, max_workers=2, deadline=0.5,
+                         session=make_session(pool_size=2))
+        assert time.perf_counter() - start < 0.8
+    finally:
+        listener.close()
@@ -0,0 +1,43 @@
+import io
+import json
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from service import app
+
+
+FIELD = {"N": 90, "P": 42, "K": 43, "temperature": 21, "humidity": 82, "ph": 6.5, "rainfall": 203,
+         "soil_moisture": 29, "soil_type": "Loamy", "sunlight_exposure": 8.7}
+
+
+def post(path, body):
+    data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+    environ = {"REQUEST_METHOD": "POST", "PATH_INFO": path, "CONTENT_LENGTH": str(len(data)),
+               "wsgi.input": io.BytesIO(data)}
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, headers):
+        response["status"] = int(status.split()[0])
+
+    response["body"] = json.loads(b"".join(app(environ, start_response)))
+    return response
+
+
+def test_recommend():
+    response = post("/recommend", FIELD)
+    assert response["status"] == 200
+    assert len(response["body"]["recommendations"]) == 3
+
+
+# json.loads accepts the NaN and Infinity literals
+@pytest.mark.parametrize("value", ["null", "NaN", "Infinity", "-Infinity"])
+def test_non_finite_values_are_rejected(value):
+    body = json.dumps(dict(FIELD, N=0)).replace('"N": 0', f'"N": {value}')
+    response = post("/recommend", body)
+    assert response["status"] == 400
+    assert "N" in response["body"]["error"]
+
+    batch = json.dumps({"rows": [FIELD, dict(FIELD, N=0)]}).replace('"N": 0', f'"N": {value}')
+    assert post("/recommend/batch", batch)["status"] == 400
@@ -0,0 +1,210 @@
+"""Incremental model updates from newly labelled field outcomes.
+
+Adds boosting rounds to the current booster using only the new rows,
+instead of rerunning model.py from scratch:
+
+    python update.py new_outcomes.csv --rounds 50
+    python update.py new_outcomes.csv --compare    # also time a full retrain
+
+The saved scaler and label classes are reused unchanged, so every feature
+is scaled exactly as before and class indices keep their meaning. The
+result is written as a new artifact version; by default it replaces the
+current model, which running apps and the service pick up on their next
+reload check.
+
+The new rows are split three ways: rows to train on, validation rows
+for early stopping and test rows that no model is stopped on.
+Accuracies are measured on the test rows for the previous model, the
+update and (with --compare) a full retrain on the old plus new rows with
+the same parameters.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from artifacts import ARTIFACT_DIR, BoosterClassifier, file_sha256, load_artifact, save_artifact
+from dataset import DATASET_PATH, load_dataset
+
+
+# Booster training parameters carried over from the existing model
+TREE_PARAMS = ["learning_rate", "max_depth", "min_child_weight", "subsample", "colsample_bytree",
+               "gamma", "reg_lambda", "max_bin"]
+
+
+def training_params(model, manifest, learning_rate=None):
+    """Parameters of the existing booster, from the manifest or its own config."""
+    params = dict(manifest.get("params") or {})
+    if not params:
+        # Older artifacts (e.g. converted pickles) only have the booster config
+        config = json.loads(model.get_booster().save_config())
+        tree_params = config["learner"]["gradient_booster"]["tree_train_param"]
+        params = {name: float(tree_params[name]) for name in TREE_PARAMS if name in tree_params}
+        for name in ("max_depth", "max_bin"):
+            if name in params:
+                params[name] = int(params[name])
+    if learning_rate:
+        params["learning_rate"] = learning_rate
+    params.update({"objective": "multi:softprob", "num_class": manifest["n_classes"],
+                   "tree_method": "hist", "eval_metric": "mlogloss"})
+    return params
+
+
+def encode_rows(df, features, le, scaler):
+    """Scaled X and encoded y with the saved preprocessing, no refitting."""
+    missing = [name for name in features + ["label"] if name not in df.columns]
+    if missing:
+        raise ValueError(f"New data is missing columns: {', '.join(missing)}")
+    unknown = sorted(set(df["label"].astype(str)) - set(le.classes_))
+    if unknown:
+        # The booster has one output per class; new classes need a full retrain
+        raise ValueError(f"Unknown crop labels {unknown}; run model.py to add new classes")
+    X = scaler.transform(df[features].to_numpy(dtype=np.float64))
+    return X, le.transform(df["label"].astype(str))
+
+
+def holdout_split(X, y, val_size, seed):
+    from sklearn.model_selection import train_test_split
+
+    n_rows = len(y)
+    n_val = math.ceil(val_size * n_rows)
+    if n_rows < 2 or not 0 < n_val < n_rows:
+        raise ValueError(f"{n_rows} new rows are too few to hold out {val_size:.0%}")
+    # Stratify when every class has rows for both sides and each side has
+    # room for one row of every class; small batches split at random
+    counts = np.bincount(y)
+    n_classes = int((counts > 0).sum())
+    can_stratify = counts[counts > 0].min() >= 2 and min(n_val, n_rows - n_val) >= n_classes
+    return train_test_split(X, y, test_size=n_val, stratify=y if can_stratify else None, random_state=seed)
+
+
+def add_rounds(booster, params, X_train, y_train, X_val, y_val, rounds, early_stopping_rounds):
+    """Continue training booster on the new rows; returns the trimmed booster."""
+    start_rounds = booster.num_boosted_rounds()
+    dtrain = xgb.DMatrix(X_train, label=y_train)
+    dval = xgb.DMatrix(X_val, label=y_val)
+    updated = xgb.train(params, dtrain, num_boost_round=rounds, xgb_model=booster,
+                        evals=[(dval, "validation")], early_stopping_rounds=early_stopping_rounds,
+                        verbose_eval=False)
+    # best_iteration counts the rounds of the original booster too
+    best = max(updated.best_iteration + 1, start_rounds)
+    return updated[:best], best - start_rounds
+
+
+def accuracy(booster, n_classes, X, y):
+    return float((BoosterClassifier(booster, n_classes).predict(X) == y).mean())
+
+
+def full_retrain(params, X_train, y_train, X_val, y_val, max_rounds, early_stopping_rounds):
+    """Baseline: a fresh booster on old + new rows with the same parameters."""
+    dtrain = xgb.DMatrix(X_train, label=y_train)
+    dval = xgb.DMatrix(X_val, label=y_val)
+    booster = xgb.train(params, dtrain, num_boost_round=max_rounds, evals=[(dval, "validation")],
+                        early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+    return booster[:booster.best_iteration + 1]
+
+
+def update_model(new_data, model_dir=ARTIFACT_DIR, out=None, rounds=50, learning_rate=None,
+                 early_stopping_rounds=10, val_size=0.2, test_size=0.2, compare=False, base_data=None, seed=42):
+    out = out or model_dir
+    model, le, scaler, manifest = load_artifact(model_dir)
+    features = manifest["features"]
+    n_classes = manifest["n_classes"]
+    params = training_params(model, manifest, learning_rate)
+    params["seed"] = seed
+
+    X_new, y_new = encode_rows(pd.read_csv(new_data), features, le, scaler)
+    # Test rows only score the models; early stopping sees the validation
+    # rows, so scoring on those would favour the model stopped on them
+    X_rest, X_test, y_rest, y_test = holdout_split(X_new, y_new, test_size, seed)
+    X_train, X_val, y_train, y_val = holdout_split(X_rest, y_rest, val_size, seed)
+
+    booster = model.get_booster()
+    report = {"rows": int(len(y_new)), "train_rows": int(len(y_train)), "validation_rows": int(len(y_val)),
+              "test_rows": int(len(y_test)), "previous_version": manifest["version"],
+              "previous_accuracy": accuracy(booster, n_classes, X_test, y_test)}
+
+    start = time.perf_counter()
+    updated, added = add_rounds(booster, params, X_train, y_train, X_val, y_val, rounds, early_stopping_rounds)
+    report.update(incremental_seconds=time.perf_counter() - start, rounds_added=int(added),
+                  incremental_accuracy=accuracy(updated, n_classes, X_test, y_test))
+
+    if compare:
+        base_data = base_data or (manifest.get("dataset") or {}).get("path") or DATASET_PATH
+        X_old, y_old = encode_rows(load_dataset(base_data, columns=features + ["label"]), features, le, scaler)
+        start = time.perf_counter()
+        retrained = full_retrain(params, np.vstack([X_old, X_train]), np.concatenate([y_old, y_train]),
+                                 X_val, y_val, max(booster.num_boosted_rounds() + rounds, 100),
+                                 early_stopping_rounds)
+        report.update(retrain_seconds=time.perf_counter() - start,
+                      retrain_accuracy=accuracy(retrained, n_classes, X_test, y_test))
+
+    updates = list(manifest.get("updates", []))
+    updates.append({"path": os.path.basename(new_data), "sha256": file_sha256(new_data),
+                    "rows": report["rows"], "rounds_added": report["rounds_added"],
+                    "parent_version": manifest["version"],
+                    "updated_at": datetime.now().isoformat(timespec="seconds")})
+    metrics = dict(manifest.get("metrics") or {})
+    metrics.update({"update_accuracy": report["incremental_accuracy"],
+                    "boosting_rounds": int(updated.num_boosted_rounds())})
+    extra = {key: value for key, value in manifest.items()
+             if key not in ("format_version", "version", "created_at", "features", "n_classes",
+                            "dataset", "metrics", "xgboost_version", "booster_format", "files")}
+    extra.update({"params": {k: v for k, v in params.items() if k in TREE_PARAMS}, "updates": updates})
+    base_dataset = (manifest.get("dataset") or {}).get("path")
+    new_manifest = save_artifact(out, BoosterClassifier(updated, n_classes), le, scaler, features=features,
+                                 dataset_path=base_dataset if base_dataset and os.path.exists(base_dataset) else None,
+                                 metrics=metrics, extra=extra,
+                                 # Keep the format the model was stored in; older manifests are binary
+                                 booster_format=manifest.get("booster_format", "deprecated"))
+    report["version"] = new_manifest["version"]
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Add boosting rounds from newly labelled rows")
+    parser.add_argument("new_data", help="CSV with the model features and a label column")
+    parser.add_argument("--model", default=ARTIFACT_DIR, help="artifact directory to update")
+    parser.add_argument("--out", default=None, help="where to write the new version (default: --model)")
+    parser.add_argument("--rounds", type=int, default=50, help="maximum boosting rounds to add")
+    parser.add_argument("--learning-rate", type=float, default=None,
+                        help="learning rate for the new rounds (default: the model's own)")
+    parser.add_argument("--early-stopping-rounds", type=int, default=10)
+    parser.add_argument("--test-size", type=float, default=0.2,
+                        help="share of the new rows held out to score the models")
+    parser.add_argument("--val-size", type=float, default=0.2,
+                        help="share of the remaining new rows held out to stop early")
+    parser.add_argument("--compare", action="store_true",
+                        help="also retrain from scratch on the old + new rows and compare")
+    parser.add_argument("--base-data", default=None, help="original training CSV for --compare")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = update_model(args.new_data, model_dir=args.model, out=args.out, rounds=args.rounds,
+                          learning_rate=args.learning_rate, early_stopping_rounds=args.early_stopping_rounds,
+                          val_size=args.val_size, test_size=args.test_size, compare=args.compare,
+                          base_data=args.base_data, seed=args.seed)
+
+    print(f"{report['rows']} new rows: {report['train_rows']} to train, {report['validation_rows']} to stop early, "
+          f"{report['test_rows']} to score")
+    print(f"Previous model {report['previous_version']}: accuracy {report['previous_accuracy']:.3f}")
+    print(f"Incremental update: +{report['rounds_added']} rounds in {report['incremental_seconds']:.2f}s, "
+          f"accuracy {report['incremental_accuracy']:.3f}")
+    if "retrain_seconds" in report:
+        print(f"Full retrain: {report['retrain_seconds']:.2f}s, accuracy {report['retrain_accuracy']:.3f} "
+              f"({report['retrain_seconds'] / max(report['incremental_seconds'], 1e-9):.1f}x the update time, "
+              f"without model.py's search and resampling)")
+    print(f"Saved version {report['version']} to '{args.out or args.model}'")
+
+
+if __name__ == "__main__":
+    main()